@@ -0,0 +1,48 @@
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ban_filter import BanFilter
+
+N_IDS = 1_000_000
+N_LOOKUPS = 200_000
+
+def snowflake(rng: random.Random) -> int:
+    return rng.randrange(100_000_000_000_000_000, 1_400_000_000_000_000_000)
+
+def measure(build):
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+def main():
+    rng = random.Random(17)
+    ids = [snowflake(rng) for _ in range(N_IDS)]
+    str_ids = [str(user_id) for user_id in ids]
+    probes = [rng.choice(str_ids) if i % 100 == 0 else str(snowflake(rng)) for i in range(N_LOOKUPS)]
+
+    plain_set, set_bytes = measure(lambda: {str(user_id) for user_id in ids})
+    ban_filter, filter_bytes = measure(lambda: _loaded_filter(ids))
+
+    set_time = timeit.timeit(lambda: [p in plain_set for p in probes], number=3) / 3
+    filter_time = timeit.timeit(lambda: [p in ban_filter for p in probes], number=3) / 3
+
+    print(f"{N_IDS:,} ids, {N_LOOKUPS:,} lookups (1% hits)")
+    print(f"{'structure':<12}{'memory':>14}{'ns/lookup':>12}")
+    print(f"{'set[str]':<12}{set_bytes / 2**20:>11.1f} MB{set_time / N_LOOKUPS * 1e9:>12.0f}")
+    print(f"{'BanFilter':<12}{filter_bytes / 2**20:>11.1f} MB{filter_time / N_LOOKUPS * 1e9:>12.0f}")
+    assert all((p in plain_set) == (p in ban_filter) for p in probes)
+
+def _loaded_filter(ids):
+    ban_filter = BanFilter()
+    ban_filter.load(ids)
+    return ban_filter
+
+if __name__ == '__main__':
+    main()
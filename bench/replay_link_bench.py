@@ -0,0 +1,67 @@
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.replay_links import find_video_link
+
+N_MESSAGES = 100_000
+LINK_RATE = 0.01
+
+# Used when no corpus file is given: everyday chat lines plus the occasional link.
+CHAT = [
+    "lol", "gm everyone", "who's up for ranked tonight?", "ok", "brb dinner",
+    "did anyone see the patch notes https://example.com/patch/1.2.3", "same",
+    "that boss fight was insane, took me like 40 tries", "check #announcements",
+    "<@123456789012345678> you coming?", "xd", "what time is the event", "nice",
+    "https://discord.com/channels/1/2/3", "I uploaded the clip to my drive",
+]
+LINKS = [
+    "https://www.tiktok.com/@some.user/video/7301234567890123456?is_from_webapp=1",
+    "look at this vm.tiktok.com/ZMabc12/ lmao",
+    "https://youtube.com/shorts/dQw4w9WgXcQ?si=abc",
+    "https://youtu.be/dQw4w9WgXcQ",
+]
+
+def legacy_find(content: str):
+    SUPPORTED_PLATFORMS = ["tiktok.com", "youtube.com/shorts"]
+    found_url = None
+    for word in content.split():
+        for platform in SUPPORTED_PLATFORMS:
+            if platform in word.lower():
+                found_url = word
+                break
+        if found_url:
+            break
+    return found_url
+
+def load_corpus():
+    # A recorded corpus is one message per line, e.g. exported from a busy channel.
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            return [line.rstrip("\n") for line in f if line.strip()]
+    rng = random.Random(17)
+    return [rng.choice(LINKS) if rng.random() < LINK_RATE else rng.choice(CHAT) for _ in range(N_MESSAGES)]
+
+def main():
+    corpus = load_corpus()
+    opted_in = set(range(0, 1000, 10))
+    guilds = [i % 1000 for i in range(len(corpus))]
+
+    legacy = timeit.timeit(lambda: [legacy_find(m) for m in corpus], number=3) / 3
+    detector = timeit.timeit(lambda: [find_video_link(m) for m in corpus], number=3) / 3
+    gated = timeit.timeit(
+        lambda: [find_video_link(m) for m, g in zip(corpus, guilds) if g in opted_in], number=3
+    ) / 3
+
+    found = sum(find_video_link(m) is not None for m in corpus)
+    print(f"{len(corpus):,} messages, {found:,} with a supported link")
+    print(f"{'matcher':<28}{'ns/message':>12}")
+    print(f"{'legacy split + substring':<28}{legacy / len(corpus) * 1e9:>12.0f}")
+    print(f"{'precompiled detector':<28}{detector / len(corpus) * 1e9:>12.0f}")
+    print(f"{'detector, 10% guilds opted in':<28}{gated / len(corpus) * 1e9:>12.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import functools
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORK_DIR = tempfile.mkdtemp(prefix="replay-bench-")
+os.environ.setdefault("REPLAY_CACHE_DIR", os.path.join(WORK_DIR, "cache"))
+os.environ.setdefault("REPLAY_SCRATCH_DIR", os.path.join(WORK_DIR, "jobs"))
+
+import discord
+
+from cmd.single.replay import Replay
+from utils.replay_metrics import percentile
+
+# Three fixtures, one per route: passthrough, remux and transcode.
+FIXTURES = {
+    "h264.mp4": ["-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac"],
+    "h264.mkv": ["-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac"],
+    "mpeg4.mkv": ["-c:v", "mpeg4", "-q:v", "5", "-c:a", "aac"],
+}
+
+def make_fixtures(directory: str, seconds: int) -> None:
+    if shutil.which("ffmpeg") is None:
+        sys.exit("ffmpeg is required to generate fixtures; pass --fixtures with existing video files instead")
+    for name, codec_args in FIXTURES.items():
+        subprocess.run([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size=720x1280:rate=30:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+            *codec_args, "-shortest", os.path.join(directory, name)
+        ], check=True)
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    # /<stem>-<n>.<ext> serves <stem>.<ext>, so every request gets its own video id.
+    def translate_path(self, path):
+        name = os.path.basename(path.split("?", 1)[0])
+        stem, ext = os.path.splitext(name)
+        return super().translate_path("/" + stem.rsplit("-", 1)[0] + ext)
+
+    def log_message(self, format, *args):
+        pass
+
+class FixtureServer(ThreadingHTTPServer):
+    # yt-dlp's generic extractor hangs up after sniffing the first bytes; that is not an error here.
+    def handle_error(self, request, client_address):
+        pass
+
+def serve(directory: str) -> ThreadingHTTPServer:
+    server = FixtureServer(("127.0.0.1", 0), functools.partial(FixtureHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def fake_upload(replay: Replay, video_path: str) -> None:
+    # Stand-in for the Discord upload: stream the file the way discord.File is read.
+    with replay.metrics.time("upload"):
+        file = discord.File(video_path, filename="replay.mp4")
+        try:
+            while file.fp.read(1 << 16):
+                await asyncio.sleep(0)
+        finally:
+            file.close()
+    replay.metrics.bytes_out += os.stat(video_path).st_size
+
+async def run_phase(replay: Replay, urls, concurrency: int):
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int, url: str):
+        async with limit:
+            started = time.perf_counter()
+            video_path, _ = await replay.download_video(url, guild_id=i % 4, user_id=i)
+            await fake_upload(replay, video_path)
+            elapsed = time.perf_counter() - started
+            replay.metrics.record("total", elapsed)
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i, url) for i, url in enumerate(urls)))
+    return time.perf_counter() - started, latencies
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline throughput/latency benchmark of the replay pipeline")
+    parser.add_argument("--fixtures", help="directory of video files to serve instead of generated ones")
+    parser.add_argument("--requests", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=int, default=10, help="length of generated fixtures")
+    args = parser.parse_args()
+    fixtures = os.path.abspath(args.fixtures) if args.fixtures else None
+    # cookies.txt is resolved against the working directory; never pick up the bot's real one.
+    os.chdir(WORK_DIR)
+    try:
+        await run(args, fixtures)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+async def run(args, fixtures):
+    if fixtures is None:
+        fixtures = os.path.join(WORK_DIR, "fixtures")
+        os.makedirs(fixtures)
+        make_fixtures(fixtures, args.seconds)
+    names = sorted(name for name in os.listdir(fixtures) if not name.startswith("."))
+    server = serve(fixtures)
+    host, port = server.server_address
+    urls = []
+    for i in range(args.requests):
+        stem, ext = os.path.splitext(names[i % len(names)])
+        urls.append(f"http://{host}:{port}/{stem}-{i}{ext}")
+
+    replay = Replay(SimpleNamespace())
+    replay.jobs.max_pending = replay.jobs.max_per_guild = replay.jobs.max_per_user = args.requests
+    try:
+        for phase in ("cold", "warm"):
+            elapsed, latencies = await run_phase(replay, urls, args.concurrency)
+            print(
+                f"{phase}: {len(urls)} requests in {elapsed:.2f}s, {len(urls) / elapsed:.1f} req/s, "
+                f"p50 {percentile(latencies, 50) * 1000:.0f} ms, p95 {percentile(latencies, 95) * 1000:.0f} ms"
+            )
+        print(replay.metrics.format())
+    finally:
+        await replay.cog_unload()
+        server.shutdown()
+
+if __name__ == '__main__':
+    asyncio.run(main())
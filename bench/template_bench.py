@@ -0,0 +1,63 @@
+import os
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cmd.group.embed_commands import build_embed, replace_placeholders, update_embed_placeholders
+from utils.template import CompiledMessage
+
+JOINS = 1000
+
+MESSAGE = "Chào mừng {user} ({user_tag}) đã tới {server_name}! Bạn là thành viên thứ {server_membercount}. {embed:welcome}"
+EMBED_DOC = {
+    "name": "welcome",
+    "author": {"name": "{user_tag}", "icon_url": "{user_avatar}"},
+    "title": "Welcome to {server_name}",
+    "description": "Hi {user}, please read the rules. We now have {server_membercount} members.",
+    "color": 0xFFCCFF,
+    "footer": {"text": "{server_name}", "icon_url": "{server_avatar}", "timestamp": True},
+    "thumbnail": "{user_avatar}",
+    "image": "https://example.com/banner.png",
+}
+
+def fake_member(i: int):
+    return SimpleNamespace(
+        mention=f"<@{10**17 + i}>",
+        display_name=f"member{i}",
+        display_avatar=SimpleNamespace(url=f"https://cdn.discordapp.com/avatars/{10**17 + i}/a.png"),
+    )
+
+GUILD = SimpleNamespace(name="Elaina", member_count=1234, icon=SimpleNamespace(url="https://cdn.discordapp.com/icons/1/i.png"))
+
+def legacy_render(member):
+    text = replace_placeholders(MESSAGE, member, GUILD)
+    names = re.findall(r"\{embed:([^}]+)\}", text)
+    embeds = [update_embed_placeholders(build_embed(EMBED_DOC), member, GUILD) for _ in names]
+    return re.sub(r"\{embed:[^}]+\}", "", text).strip(), embeds
+
+def compiled_render(compiled, member):
+    return compiled.render(member, GUILD)
+
+def main():
+    members = [fake_member(i) for i in range(JOINS)]
+
+    started = time.perf_counter()
+    for member in members:
+        legacy_render(member)
+    legacy = time.perf_counter() - started
+
+    started = time.perf_counter()
+    compiled = CompiledMessage(MESSAGE, [EMBED_DOC])
+    for member in members:
+        compiled_render(compiled, member)
+    precompiled = time.perf_counter() - started
+
+    print(f"{JOINS} joins, 1 embed per message")
+    print(f"legacy replace/regex: {legacy * 1000:8.2f} ms total, {legacy / JOINS * 1e6:7.1f} us/join")
+    print(f"precompiled template: {precompiled * 1000:8.2f} ms total, {precompiled / JOINS * 1e6:7.1f} us/join")
+
+if __name__ == '__main__':
+    main()
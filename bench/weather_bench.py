@@ -0,0 +1,251 @@
+import argparse
+import asyncio
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORK_DIR = tempfile.mkdtemp(prefix="weather-bench-")
+CERT = os.path.join(WORK_DIR, "cert.pem")
+KEY = os.path.join(WORK_DIR, "key.pem")
+
+def make_cert() -> bool:
+    # A self-signed loopback certificate, so the handshakes the shared session saves are real.
+    if shutil.which("openssl") is None:
+        return False
+    subprocess.run([
+        "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+        "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+        "-keyout", KEY, "-out", CERT
+    ], check=True, capture_output=True)
+    return True
+
+TLS = make_cert()
+PORT = 18080
+if TLS:
+    # aiohttp builds its default SSL context at import time; trust the bench certificate first.
+    os.environ["SSL_CERT_FILE"] = CERT
+os.environ.setdefault("OWM_API_BASE", f"{'https' if TLS else 'http'}://127.0.0.1:{PORT}/data/2.5")
+os.environ.setdefault("OWM_GEO_BASE", f"{'https' if TLS else 'http'}://127.0.0.1:{PORT}/geo/1.0")
+
+import aiohttp
+from aiohttp import web
+
+from cmd.single.weather import (
+    CITIES, WEATHER_CALL_TIMEOUT, WeatherCog, remove_accents, fetch_weather, fetch_uv_index, fetch_air_quality,
+    fetch_day_extremes, fetch_forecast, fetch_report
+)
+from utils.replay_metrics import percentile
+
+def mock_app(latency: float, uv_latency: float) -> web.Application:
+    connections = set()
+    calls = Counter()
+
+    async def reply(request: web.Request, payload: dict, delay: float = latency) -> web.Response:
+        connections.add(request.transport)
+        calls[request.path.rsplit("/", 1)[-1]] += 1
+        await asyncio.sleep(delay)
+        return web.json_response(payload)
+
+    def coord(name: str) -> dict:
+        crc = zlib.crc32(name.encode())
+        return {"lat": 8 + crc % 1500 / 100, "lon": 102 + crc % 700 / 100}
+
+    def city(city_id: int) -> dict:
+        return {
+            "id": city_id,
+            "coord": coord(str(city_id)),
+            "main": {"temp": 31.4, "humidity": 70, "pressure": 1008},
+            "weather": [{"description": "scattered clouds", "icon": "03d"}],
+            "wind": {"speed": 3.6, "deg": 140},
+            "sys": {"country": "VN"},
+        }
+
+    async def weather(request):
+        location = request.query.get("q") or f"{request.query['lat']},{request.query['lon']}"
+        return await reply(request, city(zlib.crc32(location.encode())))
+
+    async def direct(request):
+        return await reply(request, [{"name": request.query["q"], **coord(request.query["q"])}])
+
+    async def group(request):
+        ids = [int(city_id) for city_id in request.query["id"].split(",")]
+        return await reply(request, {"cnt": len(ids), "list": [city(city_id) for city_id in ids]})
+
+    async def uvi(request):
+        return await reply(request, {"value": 9.2}, uv_latency)
+
+    async def air(request):
+        return await reply(request, {"list": [{"main": {"aqi": 2}}]})
+
+    async def timemachine(request):
+        now = int(time.time())
+        return await reply(request, {"hourly": [{"dt": now - 3600 * h, "temp": 26 + h % 6} for h in range(12)]})
+
+    async def forecast(request):
+        now = int(time.time())
+        return await reply(request, {"list": [
+            {
+                "dt_txt": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now + 10800 * i)),
+                "main": {"temp": 27 + i % 5},
+                "pop": (i % 4) / 4,
+            }
+            for i in range(40)
+        ]})
+
+    app = web.Application()
+    app["connections"] = connections
+    app["calls"] = calls
+    app.router.add_get("/data/2.5/weather", weather)
+    app.router.add_get("/data/2.5/group", group)
+    app.router.add_get("/geo/1.0/direct", direct)
+    app.router.add_get("/data/2.5/uvi", uvi)
+    app.router.add_get("/data/2.5/air_pollution", air)
+    app.router.add_get("/data/2.5/onecall/timemachine", timemachine)
+    app.router.add_get("/data/2.5/forecast", forecast)
+    return app
+
+class OneShotSession:
+    # The old behaviour: every request opened, and tore down, its own ClientSession.
+    @asynccontextmanager
+    async def get(self, url, **kwargs):
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, **kwargs) as response:
+                yield response
+
+async def serial_command(session, city: str) -> None:
+    # The five calls /weather used to make one after another.
+    data = await fetch_weather(session, city)
+    assert data and data["temperature"] is not None, "mock server did not answer"
+    await fetch_uv_index(session, data["lat"], data["lon"])
+    await fetch_air_quality(session, data["lat"], data["lon"])
+    await fetch_day_extremes(session, data["lat"], data["lon"])
+    await fetch_forecast(session, city)
+
+async def concurrent_command(session, city: str) -> None:
+    report = await fetch_report(session, city)
+    assert report, "mock server did not answer"
+
+def geocoded_command(cog: WeatherCog):
+    async def command(session, city: str) -> None:
+        report = await fetch_report(session, city, geocodes=cog.geocodes)
+        assert report, "mock server did not answer"
+    return command
+
+def cached_command(cog: WeatherCog):
+    async def command(session, city: str) -> None:
+        report = await fetch_report(session, city, cog.caches)
+        assert report, "mock server did not answer"
+    return command
+
+async def measure(command, session, commands: int):
+    latencies = []
+    for i in range(commands):
+        started = time.perf_counter()
+        await command(session, f"City {i % 10}")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+def age(cog: WeatherCog, tier: str, seconds: float) -> None:
+    # Stands in for the clock moving on, without waiting out a real TTL.
+    entries = cog.caches[tier]._entries
+    for key, (value, stored) in entries.items():
+        entries[key] = (value, stored - seconds)
+
+async def bench_prewarm(app) -> None:
+    app["calls"].clear()
+    cog = WeatherCog(bot=None)
+    await cog.cog_load()
+    # The prewarm runs below seed the geocode store from their own budget.
+    cog.geocoder.cancel()
+    try:
+        print(f"\nprewarm of {len(CITIES)} cities, {cog.prewarm.minutes:.0f} min runs")
+        runs = 0
+        while True:
+            before = sum(app["calls"].values())
+            await cog.prewarm()
+            if sum(app["calls"].values()) == before:
+                break
+            runs += 1
+        print(f"cold start: {runs} runs, {len(cog.geocodes)} cities geocoded, calls {dict(app['calls'])}")
+
+        app["calls"].clear()
+        latencies = []
+        for name in CITIES:
+            started = time.perf_counter()
+            await fetch_report(cog.session, remove_accents(name), cog.caches)
+            latencies.append(time.perf_counter() - started)
+        print(
+            f"/weather for every city: avg {sum(latencies) / len(latencies) * 1000:.2f} ms, "
+            f"p95 {percentile(latencies, 95) * 1000:.2f} ms, OWM calls {sum(app['calls'].values())}"
+        )
+
+        age(cog, "current", cog.caches["current"].ttl)
+        app["calls"].clear()
+        await cog.prewarm()
+        print(f"refresh of current conditions: calls {dict(app['calls'])}")
+    finally:
+        await cog.cog_unload()
+
+async def run(args):
+    app = mock_app(args.latency / 1000, (args.slow_uv or args.latency) / 1000)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    ssl_context = None
+    if TLS:
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(CERT, KEY)
+    await web.TCPSite(runner, "127.0.0.1", PORT, ssl_context=ssl_context).start()
+
+    cog = WeatherCog(bot=None)
+    await cog.cog_load()
+    # These rows use their own city names; keep CITIES geocoding out of the timings.
+    cog.geocoder.cancel()
+    try:
+        print(f"{args.commands} commands against a mock OWM server ({'https' if TLS else 'http'}, {args.latency} ms per request)")
+        if args.slow_uv:
+            print(f"/uvi answers after {args.slow_uv} ms; per-call timeout is {WEATHER_CALL_TIMEOUT * 1000:.0f} ms")
+        print(f"{'client':<34}{'avg':>9}{'p50':>9}{'p95':>9}{'conns':>8}")
+        runs = (
+            ("session per request, serial", serial_command, OneShotSession()),
+            ("shared session, serial", serial_command, cog.session),
+            ("shared session, concurrent", concurrent_command, cog.session),
+            ("concurrent, known coordinates", geocoded_command(cog), cog.session),
+            ("concurrent + cache, 10 cities", cached_command(cog), cog.session),
+        )
+        for name, command, session in runs:
+            app["connections"].clear()
+            latencies = await measure(command, session, args.commands)
+            print(
+                f"{name:<34}{sum(latencies) / len(latencies) * 1000:>7.1f}ms"
+                f"{percentile(latencies, 50) * 1000:>7.1f}ms{percentile(latencies, 95) * 1000:>7.1f}ms"
+                f"{len(app['connections']):>8}"
+            )
+        hit_ratios = ", ".join(f"{tier} {stats['hit_ratio']:.0%}" for tier, stats in cog.cache_stats().items())
+        print(f"cache hit ratio: {hit_ratios}")
+        await bench_prewarm(app)
+    finally:
+        await cog.cog_unload()
+        await runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-command latency of /weather against a local mock OWM server")
+    parser.add_argument("--commands", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=5, help="simulated server time per request, in ms")
+    parser.add_argument("--slow-uv", type=float, default=0, help="make /uvi answer after this many ms")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
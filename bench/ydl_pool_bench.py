@@ -0,0 +1,106 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORK_DIR = tempfile.mkdtemp(prefix="ydl-pool-bench-")
+os.environ.setdefault("REPLAY_CACHE_DIR", os.path.join(WORK_DIR, "cache"))
+os.environ.setdefault("REPLAY_SCRATCH_DIR", os.path.join(WORK_DIR, "jobs"))
+
+import yt_dlp as youtube_dl
+
+from cmd.single.replay import Replay
+
+JOBS = 200
+CONCURRENCY = 4
+N_COOKIES = 200
+PLATFORM = "tiktok.com"
+
+def write_cookies(path: str) -> None:
+    # A cookie export of realistic size, so parsing it is part of the measured setup.
+    with open(path, "w") as f:
+        f.write("# Netscape HTTP Cookie File\n")
+        for i in range(N_COOKIES):
+            f.write(f".tiktok.com\tTRUE\t/\tTRUE\t2000000000\tcookie_{i}\t{'x' * 64}\n")
+
+def legacy_job(replay: Replay, outtmpl: str) -> None:
+    # What every job used to pay: a new YoutubeDL, its extractors and a cookies.txt read and write.
+    opts = replay._ydl_opts(PLATFORM, replay.user_agents[0])
+    opts.update(cookiefile="cookies.txt", outtmpl=outtmpl)
+    with youtube_dl.YoutubeDL(opts) as ydl:
+        for key in replay.platform_config[PLATFORM]["extractors"]:
+            ydl.get_info_extractor(key)
+        ydl.cookiejar
+
+async def bench_legacy(replay: Replay) -> float:
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    for i in range(JOBS):
+        await loop.run_in_executor(replay.executor, legacy_job, replay, f"job-{i}/source.%(ext)s")
+    return time.perf_counter() - started
+
+async def bench_pool(replay: Replay) -> float:
+    await replay.ydl_pool.warm([PLATFORM])
+    started = time.perf_counter()
+    for i in range(JOBS):
+        async with replay.ydl_pool.acquire(PLATFORM, outtmpl=f"job-{i}/source.%(ext)s") as ydl:
+            ydl.cookiejar
+    return time.perf_counter() - started
+
+async def check_concurrent(replay: Replay) -> None:
+    # Concurrent checkouts must never share an instance or leave job params behind.
+    busy = set()
+    loop = asyncio.get_running_loop()
+
+    def job(ydl, outtmpl):
+        assert id(ydl) not in busy
+        busy.add(id(ydl))
+        time.sleep(0.001)
+        assert ydl.params["outtmpl"]["default"] == outtmpl
+        busy.discard(id(ydl))
+
+    async def one(i):
+        outtmpl = f"job-{i}/source.%(ext)s"
+        async with replay.ydl_pool.acquire(PLATFORM, outtmpl=outtmpl, max_filesize=i) as ydl:
+            await loop.run_in_executor(replay.executor, job, ydl, outtmpl)
+
+    await asyncio.gather(*(one(i) for i in range(JOBS)))
+
+async def run():
+    write_cookies("cookies.txt")
+    replay = Replay(SimpleNamespace())
+    try:
+        legacy = await bench_legacy(replay)
+        pooled = await bench_pool(replay)
+        with open("cookies.txt") as f:
+            before = f.read()
+        # A newer cookies.txt must be picked up by the next checkout.
+        os.utime("cookies.txt", (time.time() + 1, time.time() + 1))
+        await check_concurrent(replay)
+        stats = replay.ydl_pool.stats()
+    finally:
+        await replay.cog_unload()
+    with open("cookies.txt") as f:
+        unchanged = f.read() == before
+    print(f"{JOBS} jobs, {N_COOKIES} cookies, platform {PLATFORM}")
+    print(f"{'setup':<28}{'ms/job':>10}")
+    print(f"{'new YoutubeDL per job':<28}{legacy / JOBS * 1000:>10.2f}")
+    print(f"{'pooled checkout':<28}{pooled / JOBS * 1000:>10.3f}")
+    print(f"pool: {stats}")
+    print(f"cookies.txt untouched after {JOBS} concurrent jobs: {unchanged}")
+
+def main():
+    # The legacy path writes cookies.txt back on close; keep that out of the repo.
+    os.chdir(WORK_DIR)
+    try:
+        asyncio.run(run())
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,9 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import datetime
-import re
 from typing import Optional
+from utils.embed_resolver import normalize_embed_name
+from utils.template import invalidate_embeds
 
 def replace_placeholders(text: str, member: discord.Member, guild: discord.Guild) -> str:
     if not text:
@@ -98,20 +99,6 @@ def build_embed(data: dict) -> discord.Embed:
         embed.set_image(url=data.get("image"))
     return embed
 
-def get_embeds_from_placeholders(text: str, guild_id: int, mongo_handler) -> list:
-    pattern = r"\{embed:([^}]+)\}"
-    matches = re.findall(pattern, text)
-    embeds = []
-    for embed_name in matches:
-        query = {
-            "guild_id": guild_id,
-            "name": {"$regex": f"^{re.escape(embed_name)}$", "$options": "i"}
-        }
-        doc = mongo_handler.db["embed"].find_one(query)
-        if doc:
-            embeds.append(build_embed(doc))
-    return embeds
-
 class AuthorModal(discord.ui.Modal, title="Edit Author"):
     author_name = discord.ui.TextInput(
         label="Author", 
@@ -124,30 +111,28 @@ class AuthorModal(discord.ui.Modal, title="Edit Author"):
         required=False
     )
 
-    def __init__(self, name: str, guild_id: int, view: discord.ui.View, bot: commands.Bot):
+    def __init__(self, name: str, guild_id: int, view: discord.ui.View, bot: commands.Bot, embed_data: Optional[dict] = None):
         super().__init__()
         self.name = name
         self.guild_id = guild_id
         self.view = view
         self.bot = bot
-        mongo_handler = getattr(self.bot, "mongo_handler", None)
-        if mongo_handler is not None:
-            embed_data = mongo_handler.db["embed"].find_one({"guild_id": self.guild_id, "name": self.name})
-            if embed_data and embed_data.get("author"):
-                self.author_name.default = embed_data["author"].get("name", "")
-                self.author_image.default = embed_data["author"].get("icon_url", "")
+        if embed_data and embed_data.get("author"):
+            self.author_name.default = embed_data["author"].get("name", "")
+            self.author_image.default = embed_data["author"].get("icon_url", "")
     
     async def on_submit(self, interaction: discord.Interaction):
         mongo_handler = getattr(self.bot, "mongo_handler", None)
         if mongo_handler is None:
             await interaction.response.send_message("❌ Database connection error.", ephemeral=True)
             return
-        collection = mongo_handler.db["embed"]
-        collection.update_one(
+        await mongo_handler.update_one(
+            "embed",
             {"guild_id": self.guild_id, "name": self.name},
             {"$set": {"author": {"name": self.author_name.value, "icon_url": self.author_image.value or None}}}
         )
-        data = collection.find_one({"guild_id": self.guild_id, "name": self.name})
+        invalidate_embeds(mongo_handler, self.guild_id)
+        data = await mongo_handler.find_one("embed", {"guild_id": self.guild_id, "name": self.name})
         guild = interaction.guild
         if guild is None:
             await interaction.response.send_message("❌ This command can only be used in a server.", ephemeral=True)
@@ -181,29 +166,25 @@ class BodyModal(discord.ui.Modal, title="Edit Body"):
         required=False
     )
 
-    def __init__(self, name: str, guild_id: int, view: discord.ui.View, bot: commands.Bot):
+    def __init__(self, name: str, guild_id: int, view: discord.ui.View, bot: commands.Bot, embed_data: Optional[dict] = None):
         super().__init__()
         self.name = name
         self.guild_id = guild_id
         self.view = view
         self.bot = bot
-        mongo_handler = getattr(self.bot, "mongo_handler", None)
-        if mongo_handler is not None:
-            embed_data = mongo_handler.db["embed"].find_one({"guild_id": self.guild_id, "name": self.name})
-            if embed_data:
-                self.title_input.default = embed_data.get("title", "")
-                self.description_input.default = embed_data.get("description", "")
-                if embed_data.get("color"):
-                    self.hex_color.default = f"#{embed_data['color']:06x}"
-                else:
-                    self.hex_color.default = ""
+        if embed_data:
+            self.title_input.default = embed_data.get("title", "")
+            self.description_input.default = embed_data.get("description", "")
+            if embed_data.get("color"):
+                self.hex_color.default = f"#{embed_data['color']:06x}"
+            else:
+                self.hex_color.default = ""
     
     async def on_submit(self, interaction: discord.Interaction):
         mongo_handler = getattr(self.bot, "mongo_handler", None)
         if mongo_handler is None:
             await interaction.response.send_message("❌ Database connection error.", ephemeral=True)
             return
-        collection = mongo_handler.db["embed"]
         color_value = None
         if self.hex_color.value:
             try:
@@ -216,11 +197,13 @@ class BodyModal(discord.ui.Modal, title="Edit Body"):
             "description": self.description_input.value if self.description_input.value else None,
             "color": color_value
         }
-        collection.update_one(
+        await mongo_handler.update_one(
+            "embed",
             {"guild_id": self.guild_id, "name": self.name},
             {"$set": update_data}
         )
-        data = collection.find_one({"guild_id": self.guild_id, "name": self.name})
+        invalidate_embeds(mongo_handler, self.guild_id)
+        data = await mongo_handler.find_one("embed", {"guild_id": self.guild_id, "name": self.name})
         guild = interaction.guild
         if guild is None:
             await interaction.response.send_message("❌ This command can only be used in a server.", ephemeral=True)
@@ -253,27 +236,23 @@ class FooterModal(discord.ui.Modal, title="Edit Footer"):
         required=False
     )
 
-    def __init__(self, name: str, guild_id: int, view: discord.ui.View, bot: commands.Bot):
+    def __init__(self, name: str, guild_id: int, view: discord.ui.View, bot: commands.Bot, embed_data: Optional[dict] = None):
         super().__init__()
         self.name = name
         self.guild_id = guild_id
         self.view = view
         self.bot = bot
-        mongo_handler = getattr(self.bot, "mongo_handler", None)
-        if mongo_handler is not None:
-            embed_data = mongo_handler.db["embed"].find_one({"guild_id": self.guild_id, "name": self.name})
-            if embed_data and embed_data.get("footer"):
-                footer = embed_data["footer"]
-                self.footer_text.default = footer.get("text", "")
-                self.footer_image.default = footer.get("icon_url", "")
-                self.timestamp_input.default = "Yes" if footer.get("timestamp") else "No"
+        if embed_data and embed_data.get("footer"):
+            footer = embed_data["footer"]
+            self.footer_text.default = footer.get("text", "")
+            self.footer_image.default = footer.get("icon_url", "")
+            self.timestamp_input.default = "Yes" if footer.get("timestamp") else "No"
     
     async def on_submit(self, interaction: discord.Interaction):
         mongo_handler = getattr(self.bot, "mongo_handler", None)
         if mongo_handler is None:
             await interaction.response.send_message("❌ Database connection error.", ephemeral=True)
             return
-        collection = mongo_handler.db["embed"]
         timestamp_enabled = False
         if self.timestamp_input.value and self.timestamp_input.value.lower() == "yes":
             timestamp_enabled = True
@@ -284,11 +263,13 @@ class FooterModal(discord.ui.Modal, title="Edit Footer"):
                 "timestamp": timestamp_enabled
             }
         }
-        collection.update_one(
+        await mongo_handler.update_one(
+            "embed",
             {"guild_id": self.guild_id, "name": self.name},
             {"$set": update_data}
         )
-        data = collection.find_one({"guild_id": self.guild_id, "name": self.name})
+        invalidate_embeds(mongo_handler, self.guild_id)
+        data = await mongo_handler.find_one("embed", {"guild_id": self.guild_id, "name": self.name})
         guild = interaction.guild
         if guild is None:
             await interaction.response.send_message("❌ This command can only be used in a server.", ephemeral=True)
@@ -316,34 +297,32 @@ class ImageModal(discord.ui.Modal, title="Edit Image"):
         required=False
     )
 
-    def __init__(self, name: str, guild_id: int, view: discord.ui.View, bot: commands.Bot):
+    def __init__(self, name: str, guild_id: int, view: discord.ui.View, bot: commands.Bot, embed_data: Optional[dict] = None):
         super().__init__()
         self.name = name
         self.guild_id = guild_id
         self.view = view
         self.bot = bot
-        mongo_handler = getattr(self.bot, "mongo_handler", None)
-        if mongo_handler is not None:
-            embed_data = mongo_handler.db["embed"].find_one({"guild_id": self.guild_id, "name": self.name})
-            if embed_data:
-                self.small_image.default = embed_data.get("thumbnail", "")
-                self.big_image.default = embed_data.get("image", "")
+        if embed_data:
+            self.small_image.default = embed_data.get("thumbnail", "")
+            self.big_image.default = embed_data.get("image", "")
     
     async def on_submit(self, interaction: discord.Interaction):
         mongo_handler = getattr(self.bot, "mongo_handler", None)
         if mongo_handler is None:
             await interaction.response.send_message("❌ Database connection error.", ephemeral=True)
             return
-        collection = mongo_handler.db["embed"]
         update_data = {
             "thumbnail": self.small_image.value or None,
             "image": self.big_image.value or None
         }
-        collection.update_one(
+        await mongo_handler.update_one(
+            "embed",
             {"guild_id": self.guild_id, "name": self.name},
             {"$set": update_data}
         )
-        data = collection.find_one({"guild_id": self.guild_id, "name": self.name})
+        invalidate_embeds(mongo_handler, self.guild_id)
+        data = await mongo_handler.find_one("embed", {"guild_id": self.guild_id, "name": self.name})
         guild = interaction.guild
         if guild is None:
             await interaction.response.send_message("❌ This command can only be used in a server.", ephemeral=True)
@@ -367,24 +346,30 @@ class EmbedView(discord.ui.View):
         self.bot = bot
         self.message: Optional[discord.Message] = None
 
+    async def _load_embed_data(self) -> Optional[dict]:
+        mongo_handler = getattr(self.bot, "mongo_handler", None)
+        if mongo_handler is None:
+            return None
+        return await mongo_handler.find_one("embed", {"guild_id": self.guild_id, "name": self.name})
+
     @discord.ui.button(label="Author", style=discord.ButtonStyle.secondary, custom_id="embed_author")
     async def author_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = AuthorModal(self.name, self.guild_id, self, self.bot)
+        modal = AuthorModal(self.name, self.guild_id, self, self.bot, await self._load_embed_data())
         await interaction.response.send_modal(modal)
 
     @discord.ui.button(label="Body (Title, Description, ...)", style=discord.ButtonStyle.secondary, custom_id="embed_body")
     async def body_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = BodyModal(self.name, self.guild_id, self, self.bot)
+        modal = BodyModal(self.name, self.guild_id, self, self.bot, await self._load_embed_data())
         await interaction.response.send_modal(modal)
 
     @discord.ui.button(label="Footer", style=discord.ButtonStyle.secondary, custom_id="embed_footer")
     async def footer_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = FooterModal(self.name, self.guild_id, self, self.bot)
+        modal = FooterModal(self.name, self.guild_id, self, self.bot, await self._load_embed_data())
         await interaction.response.send_modal(modal)
 
     @discord.ui.button(label="Image", style=discord.ButtonStyle.secondary, custom_id="embed_image")
     async def image_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = ImageModal(self.name, self.guild_id, self, self.bot)
+        modal = ImageModal(self.name, self.guild_id, self, self.bot, await self._load_embed_data())
         await interaction.response.send_modal(modal)
 
 class EmbedCommands(commands.Cog):
@@ -417,14 +402,14 @@ class EmbedCommands(commands.Cog):
         if mongo_handler is None:
             await interaction.response.send_message("❌ Database connection error.", ephemeral=True)
             return
-        collection = mongo_handler.db["embed"]
-        existing = collection.find_one({"guild_id": guild.id, "name": name})
+        existing = await mongo_handler.find_one("embed", {"guild_id": guild.id, "name_lower": normalize_embed_name(name)})
         if existing:
             await interaction.response.send_message("❌ Embed already exists.", ephemeral=True)
             return
         default_data = {
             "guild_id": guild.id,
             "name": name,
+            "name_lower": normalize_embed_name(name),
             "author": None,
             "title": None,
             "description": None,
@@ -433,7 +418,8 @@ class EmbedCommands(commands.Cog):
             "thumbnail": None,
             "image": None
         }
-        collection.insert_one(default_data)
+        await mongo_handler.insert_one("embed", default_data)
+        invalidate_embeds(mongo_handler, guild.id)
         member = interaction.user if isinstance(interaction.user, discord.Member) else (guild.get_member(interaction.user.id) if guild else None)
         if member is None:
             await interaction.response.send_message("❌ Could not resolve member information.", ephemeral=True)
@@ -459,8 +445,7 @@ class EmbedCommands(commands.Cog):
         if mongo_handler is None:
             await interaction.response.send_message("❌ Database connection error.", ephemeral=True)
             return
-        collection = mongo_handler.db["embed"]
-        doc = collection.find_one({"guild_id": guild.id, "name": name})
+        doc = await mongo_handler.find_one("embed", {"guild_id": guild.id, "name": name})
         if not doc:
             await interaction.response.send_message("❌ Could not find an embed with that name.", ephemeral=True)
             return
@@ -489,9 +474,9 @@ class EmbedCommands(commands.Cog):
         if mongo_handler is None:
             await interaction.response.send_message("❌ Database connection error.", ephemeral=True)
             return
-        collection = mongo_handler.db["embed"]
-        result = collection.delete_one({"guild_id": guild.id, "name": name})
-        if result.deleted_count > 0:
+        result = await mongo_handler.delete_one("embed", {"guild_id": guild.id, "name": name})
+        invalidate_embeds(mongo_handler, guild.id)
+        if result is not None and result.deleted_count > 0:
             await interaction.response.send_message("✅ Embed has been deleted.", ephemeral=True)
         else:
             await interaction.response.send_message("❌ Could not find any embed with that name.", ephemeral=True)
@@ -507,8 +492,7 @@ class EmbedCommands(commands.Cog):
         if mongo_handler is None:
             await interaction.response.send_message("❌ Database connection error.", ephemeral=True)
             return
-        collection = mongo_handler.db["embed"]
-        docs = list(collection.find({"guild_id": guild.id}))
+        docs = await mongo_handler.find("embed", {"guild_id": guild.id})
         count = len(docs)
         if count == 0:
             await interaction.response.send_message("⚠️ Please create an embed to use this command!", ephemeral=True)
@@ -563,8 +547,7 @@ class EmbedCommands(commands.Cog):
         mongo_handler = getattr(self.bot, "mongo_handler", None)
         if mongo_handler is None:
             return []
-        collection = mongo_handler.db["embed"]
-        docs = collection.find({"guild_id": guild.id})
+        docs = await mongo_handler.find("embed", {"guild_id": guild.id}, {"name": 1})
         choices = []
         for doc in docs:
             embed_name = doc.get("name")
@@ -580,8 +563,7 @@ class EmbedCommands(commands.Cog):
         mongo_handler = getattr(self.bot, "mongo_handler", None)
         if mongo_handler is None:
             return []
-        collection = mongo_handler.db["embed"]
-        docs = collection.find({"guild_id": guild.id})
+        docs = await mongo_handler.find("embed", {"guild_id": guild.id}, {"name": 1})
         choices = []
         for doc in docs:
             embed_name = doc.get("name")
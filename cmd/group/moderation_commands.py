@@ -4,6 +4,7 @@ from discord import app_commands
 import datetime
 import math
 from typing import Optional, cast
+from utils.send_queue import Priority, queue_send
 
 # Human-readable English names for time units
 unit_names = {"s": "seconds", "m": "minutes", "h": "hours", "w": "weeks"}
@@ -102,7 +103,7 @@ class Moderation(commands.Cog):
             embed.set_footer(text=f"Command executed by {interaction.user.display_name}")
 
         try:
-            await user.send(embed=embed)
+            await queue_send(self.bot, user, Priority.MODERATION, embed=embed)
         except discord.HTTPException:
             pass
 
@@ -186,7 +187,7 @@ class Moderation(commands.Cog):
         else:
             embed.set_footer(text=f"Command executed by {interaction.user.display_name}")
         try:
-            await user.send(embed=embed)
+            await queue_send(self.bot, user, Priority.MODERATION, embed=embed)
         except discord.HTTPException:
             pass
 
@@ -250,7 +251,7 @@ class Moderation(commands.Cog):
         else:
             embed.set_footer(text=f"Command executed by {interaction.user.display_name}")
         try:
-            await user.send(embed=embed)
+            await queue_send(self.bot, user, Priority.MODERATION, embed=embed)
         except discord.HTTPException:
             pass
 
@@ -312,7 +313,7 @@ class Moderation(commands.Cog):
         else:
             embed.set_footer(text=f"Command executed by {interaction.user.display_name}")
         try:
-            await user.send(embed=embed)
+            await queue_send(self.bot, user, Priority.MODERATION, embed=embed)
         except discord.HTTPException:
             pass
 
@@ -389,7 +390,7 @@ class Moderation(commands.Cog):
         else:
             embed.set_footer(text=f"Command executed by {interaction.user.display_name}")
         try:
-            await user.send(embed=embed)
+            await queue_send(self.bot, user, Priority.MODERATION, embed=embed)
         except discord.HTTPException:
             pass
 
@@ -447,7 +448,7 @@ class Moderation(commands.Cog):
         else:
             embed.set_footer(text=f"Command executed by {interaction.user.display_name}")
         try:
-            await user.send(embed=embed)
+            await queue_send(self.bot, user, Priority.MODERATION, embed=embed)
         except discord.HTTPException:
             pass
 
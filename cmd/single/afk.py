@@ -3,6 +3,7 @@ from discord.ext import commands
 from discord import app_commands
 from typing import Optional
 import datetime
+from utils.send_queue import Priority, queue_send
 
 afks = {}
 
@@ -68,7 +69,11 @@ class AFK(commands.Cog):
                     if period_value > 0:
                         time_str.append(f"{period_value} {period_name}{'s' if period_value > 1 else ''}")
             time_str = ', '.join(time_str) if time_str else '0 seconds'
-            await message.reply(f":stopwatch: Welcome back, {message.author.name}! You were AFK for **{time_str}** and received **{mention_count}** mention.", mention_author=False, delete_after=5)
+            await queue_send(
+                self.bot, message.channel, Priority.CHAT,
+                content=f":stopwatch: Welcome back, {message.author.name}! You were AFK for **{time_str}** and received **{mention_count}** mention.",
+                reference=message, mention_author=False, delete_after=5
+            )
             del afks[message.author.id]
             return
 
@@ -82,7 +87,11 @@ class AFK(commands.Cog):
                 user = message.guild.get_member(user_id)
                 if user:
                     unix_ts = int(since.timestamp())
-                    await message.reply(f"🔕 `{user.name}` is currently AFK for <t:{unix_ts}:R>: **{reason}**", mention_author=False, delete_after=5)
+                    await queue_send(
+                        self.bot, message.channel, Priority.CHAT,
+                        content=f"🔕 `{user.name}` is currently AFK for <t:{unix_ts}:R>: **{reason}**",
+                        reference=message, mention_author=False, delete_after=5
+                    )
                 break
 
 async def setup(bot: commands.Bot):
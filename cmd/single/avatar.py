@@ -14,10 +14,7 @@ class Avatar(commands.Cog):
     @commands.hybrid_command(name='avatar', description="Lấy avatar và banner người khác")
     @app_commands.describe(member="Lấy avatar và banner người khác")
     async def avatar(self, ctx: commands.Context, member: discord.Member = None):
-        user_data = await self.bot.loop.run_in_executor(
-            None, self.bot.mongo_handler.get_user_data, str(ctx.author.id)
-        )
-        if user_data.get('banned', False):
+        if await self.bot.mongo_handler.is_user_banned(str(ctx.author.id)):
             return
 
         if member is None:
@@ -77,10 +74,7 @@ class Avatar(commands.Cog):
             embed.add_field(name="Banner", value="Không có banner", inline=False)
 
         async def avatar_callback(interaction: discord.Interaction):
-            user_data = await self.bot.loop.run_in_executor(
-                None, self.bot.mongo_handler.get_user_data, str(interaction.user.id)
-            )
-            if user_data.get('banned', False):
+            if await self.bot.mongo_handler.is_user_banned(str(interaction.user.id)):
                 return
 
             embed.set_image(url=avatar_link)
@@ -88,10 +82,7 @@ class Avatar(commands.Cog):
             await interaction.response.edit_message(embed=embed)
 
         async def banner_callback(interaction: discord.Interaction):
-            user_data = await self.bot.loop.run_in_executor(
-                None, self.bot.mongo_handler.get_user_data, str(interaction.user.id)
-            )
-            if user_data.get('banned', False):
+            if await self.bot.mongo_handler.is_user_banned(str(interaction.user.id)):
                 return
 
             if banner_link:
@@ -1,20 +1,73 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 import yt_dlp as youtube_dl
 import asyncio
+import copy
 import time
-import random
-import io
-import tempfile
 import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 from discord.http import Route
+from utils.send_queue import Priority, queue_send
+from utils.replay_cache import ReplayCache, InfoCache, cache_key
+from utils.replay_links import find_video_link
+from utils.replay_queue import ReplayQueue, ReplayQueueFull
+from utils.ffmpeg import run_ffmpeg, probe_video_codec
+from utils.replay_metrics import ReplayMetrics
+from utils.replay_workspace import WorkspaceManager, WorkspaceQuotaExceeded
+from utils.ydl_pool import YDLPool
+from utils.replay_planner import (
+    UPLOAD_LIMIT, PlanError, PASSTHROUGH, REMUX, unwrap_info, plan_download, route_file, remux_args, encode_passes
+)
+
+REPLAY_CACHE_DIR = os.getenv("REPLAY_CACHE_DIR", os.path.join("cache", "replay"))
+REPLAY_CACHE_MAX_MB = int(os.getenv("REPLAY_CACHE_MAX_MB", "2048"))
+REPLAY_SCRATCH_DIR = os.getenv("REPLAY_SCRATCH_DIR", os.path.join("cache", "jobs"))
+REPLAY_SCRATCH_QUOTA_MB = int(os.getenv("REPLAY_SCRATCH_QUOTA_MB", "1024"))
+REPLAY_WORKERS = int(os.getenv("REPLAY_WORKERS", "2"))
+REPLAY_TRANSCODERS = int(os.getenv("REPLAY_TRANSCODERS", "1"))
+REPLAY_INFO_TTL = float(os.getenv("REPLAY_INFO_TTL", "300"))
+REPLAY_MAX_DURATION = float(os.getenv("REPLAY_MAX_DURATION", "600"))
+REPLAY_MAX_SOURCE_MB = int(os.getenv("REPLAY_MAX_SOURCE_MB", "200"))
+REPLAY_TWO_PASS = os.getenv("REPLAY_TWO_PASS", "0") == "1"
+REPLAY_QUEUE_SIZE = int(os.getenv("REPLAY_QUEUE_SIZE", "20"))
+REPLAY_QUEUE_PER_GUILD = int(os.getenv("REPLAY_QUEUE_PER_GUILD", "5"))
+REPLAY_QUEUE_PER_USER = int(os.getenv("REPLAY_QUEUE_PER_USER", "2"))
+
+def url_cache_key(url: str):
+    link = find_video_link(url)
+    return link.cache_key if link else None
+
+def normalize_video_url(url: str) -> str:
+    key = url_cache_key(url)
+    if key:
+        return key
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    return f"{host}{parts.path.rstrip('/')}"
+
+class _Flight:
+    """One shared download and the queue-position callbacks of everyone waiting on it."""
+    __slots__ = ("task", "waiters", "position")
+
+    def __init__(self):
+        self.task = None
+        self.waiters = []
+        self.position = 0
+
+async def _notify_queued(on_queued, position: int) -> None:
+    try:
+        await on_queued(position)
+    except Exception as e:
+        print(f"Failed to report replay queue position: {e}")
 
 class Replay(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.platform_config = {
             'tiktok.com': {
+                'extractors': ['TikTok', 'TikTokVM'],
                 'referer': 'https://www.tiktok.com/',
                 'origin': 'https://www.tiktok.com',
                 'headers': {
@@ -24,6 +77,7 @@ class Replay(commands.Cog):
                 }
             },
             'youtube.com/shorts': {
+                'extractors': ['Youtube'],
                 'referer': 'https://www.youtube.com/',
                 'origin': 'https://www.youtube.com',
                 'headers': {
@@ -38,21 +92,78 @@ class Replay(commands.Cog):
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
             "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.3.1 Mobile/15E148 Safari/604.1"
         ]
+        # yt-dlp gets its own threads so long downloads never starve the default executor.
+        self.executor = ThreadPoolExecutor(max_workers=REPLAY_WORKERS, thread_name_prefix="replay")
+        self.cache = ReplayCache(REPLAY_CACHE_DIR, REPLAY_CACHE_MAX_MB * 1024 * 1024, executor=self.executor)
+        self.info_cache = InfoCache(ttl=REPLAY_INFO_TTL)
+        self._inflight = {}
+        self.metrics = ReplayMetrics()
+        self.workspaces = WorkspaceManager(REPLAY_SCRATCH_DIR, REPLAY_SCRATCH_QUOTA_MB * 1024 * 1024)
+        self.transcode_slots = asyncio.Semaphore(REPLAY_TRANSCODERS)
+        # One warmed-up yt-dlp per worker and platform, instead of a fresh one per job.
+        self.ydl_pool = YDLPool(
+            self._ydl_opts,
+            self.user_agents,
+            size=REPLAY_WORKERS,
+            extractors={platform: config['extractors'] for platform, config in self.platform_config.items()},
+            executor=self.executor
+        )
+        self.jobs = ReplayQueue(
+            concurrency=REPLAY_WORKERS,
+            max_pending=REPLAY_QUEUE_SIZE,
+            max_per_guild=REPLAY_QUEUE_PER_GUILD,
+            max_per_user=REPLAY_QUEUE_PER_USER
+        )
+        # Guilds that opted in to automatic replays of links posted in chat.
+        self.auto_guilds = set()
+
+    async def cog_load(self):
+        asyncio.create_task(self.load_auto_guilds())
+        asyncio.create_task(self.ydl_pool.warm(self.platform_config))
+        self.janitor.start()
+
+    @tasks.loop(minutes=10)
+    async def janitor(self):
+        # Runs on the loop on purpose: a sweep in another thread could race a job creating its directory.
+        removed = self.workspaces.sweep()
+        if removed:
+            print(f"Removed {removed} stale replay workspaces")
+
+    async def load_auto_guilds(self):
+        mongo_handler = getattr(self.bot, "mongo_handler", None)
+        if mongo_handler is None:
+            return
+        try:
+            docs = await mongo_handler.find("replay", {"auto": True}, {"_id": 1})
+        except Exception as e:
+            print(f"Failed to load auto replay guilds: {e}")
+            return
+        self.auto_guilds = {doc["_id"] for doc in docs}
+
+    async def cog_unload(self):
+        self.janitor.cancel()
+        self.jobs.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.ydl_pool.close()
+        print(f"Replay cache stats: {self.cache.stats()}")
+        print(f"Replay queue stats: {self.jobs.stats()}")
+        print(f"Replay workspace stats: {self.workspaces.stats()}")
+        print(f"Replay yt-dlp pool stats: {self.ydl_pool.stats()}")
+        print(f"Replay metrics: {self.metrics.snapshot()}")
     
-    def get_platform_config(self, url: str) -> dict:
-        for platform, config in self.platform_config.items():
+    def get_platform(self, url: str) -> str:
+        for platform in self.platform_config:
             if platform in url.lower():
-                return config
-        return {}
+                return platform
+        return ''
     
-    async def download_video(self, url: str) -> tuple:
-        platform_config = self.get_platform_config(url)
-        user_agent = random.choice(self.user_agents)
-        
-        temp_fd, temp_path = tempfile.mkstemp(suffix=".mp4")
-        os.close(temp_fd)
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+    def _read_cached(self, url_key):
+        if not url_key:
+            return None
+        return self.cache.get(url_key)
+
+    def _ydl_opts(self, platform: str, user_agent: str) -> dict:
+        platform_config = self.platform_config.get(platform, {})
         
         ydl_opts = {
             'format': 'bestvideo[ext=mp4]+bestaudio/best[ext=mp4]/best',
@@ -62,7 +173,6 @@ class Replay(commands.Cog):
             'ignoreerrors': False,
             'nocheckcertificate': True,
             'force_overwrites': True,
-            'cookiefile': 'cookies.txt',
             'http_headers': {
                 'User-Agent': user_agent,
                 'Referer': platform_config.get('referer', 'https://www.google.com/'),
@@ -70,38 +180,155 @@ class Replay(commands.Cog):
                 **platform_config.get('headers', {})
             },
             'force-ipv4': True,
-            'outtmpl': temp_path,
             'extractor_args': {
                 'youtube': {
                     'player_client': ['android'],
                     'skip': ['hls', 'dash']
                 }
-            },
-            'recodevideo': 'mp4',
-            'postprocessor_args': ['-c:v', 'libx264', '-profile:v', 'main', '-preset', 'medium', '-crf', '23']
+            }
         }
+        return ydl_opts
+
+    async def preflight(self, url: str) -> tuple:
+        """Extracts metadata only and returns (info, plan), or raises PlanError for videos
+        that would fail anyway. Results and rejections are cached briefly per URL."""
+        key = normalize_video_url(url)
+        entry = self.info_cache.get(key)
+        if entry is None:
+            loop = asyncio.get_running_loop()
+            try:
+                # Two entries are enough to tell a playlist apart without extracting all of it.
+                async with self.ydl_pool.acquire(self.get_platform(url), playlist_items='1:2') as ydl:
+                    with self.metrics.time("extract"):
+                        info = await loop.run_in_executor(self.executor, lambda: ydl.extract_info(url, download=False))
+                info = unwrap_info(info)
+                entry = (info, plan_download(info, max_duration=REPLAY_MAX_DURATION, max_source_size=REPLAY_MAX_SOURCE_MB * 1024 * 1024))
+            except PlanError as e:
+                entry = e
+            except youtube_dl.utils.DownloadError as e:
+                entry = PlanError(str(e))
+            self.info_cache.set(key, entry)
+        if isinstance(entry, PlanError):
+            self.metrics.outcome("rejected")
+            raise PlanError(*entry.args)
+        return entry
+
+    async def download_video(self, url: str, guild_id: int = 0, user_id: int = 0, on_queued=None) -> tuple:
+        url_key = url_cache_key(url)
+        cached = self._read_cached(url_key)
+        if cached:
+            self.metrics.outcome("cache_hit")
+            return cached
+        # Concurrent requests for the same video share one queued job. The task is shielded
+        # so a cancelled caller does not abort the download for everyone else, and every
+        # caller hears the queue position, including those who join while it waits.
+        key = normalize_video_url(url)
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = self._inflight[key] = _Flight()
+            if on_queued is not None:
+                flight.waiters.append(on_queued)
+            flight.task = asyncio.create_task(self._fetch(url, url_key, guild_id, user_id, flight))
+            flight.task.add_done_callback(lambda t: self._download_done(key, flight))
+        else:
+            self.metrics.outcome("coalesced")
+            if on_queued is not None:
+                flight.waiters.append(on_queued)
+                if flight.position:
+                    await _notify_queued(on_queued, flight.position)
+        return await asyncio.shield(flight.task)
+
+    def _download_done(self, key: str, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    async def _fetch(self, url: str, url_key, guild_id: int, user_id: int, flight: _Flight) -> tuple:
+        async def report_position(position: int):
+            flight.position = position
+            await asyncio.gather(*(_notify_queued(on_queued, position) for on_queued in list(flight.waiters)))
+
+        def run(func):
+            async def job():
+                flight.position = 0
+                return await func()
+            return self.jobs.run(guild_id, user_id, job, report_position)
+
+        # With a cached pre-flight answer, rejections and cache hits need no queue slot.
+        # Anything that has to reach the site is admitted through the queue first, so its
+        # limits, position reports and rejections cover metadata extraction too.
+        if normalize_video_url(url) not in self.info_cache:
+            return await run(lambda: self._prepare(url, url_key))
+        info, plan = await self.preflight(url)
+        cached = self._cached_video(info)
+        if cached:
+            return cached
+        return await run(lambda: self._download_video(url, url_key, info, plan))
+
+    async def _prepare(self, url: str, url_key) -> tuple:
+        # Runs in a queue slot: no bytes are fetched for videos the pre-flight rejects.
+        info, plan = await self.preflight(url)
+        cached = self._cached_video(info)
+        if cached:
+            return cached
+        return await self._download_video(url, url_key, info, plan)
+
+    def _cached_video(self, info: dict):
+        cached = self.cache.get(cache_key(info.get('extractor_key') or 'video', str(info['id'])))
+        if cached:
+            self.metrics.outcome("cache_hit")
+        return cached
+
+    async def _download_video(self, url: str, url_key, info: dict, plan) -> tuple:
+        key = cache_key(info.get('extractor_key') or 'video', str(info['id']))
+        self.metrics.outcome("cache_miss")
+        reserve = (plan.estimated_size or 0) + (UPLOAD_LIMIT if plan.mode != PASSTHROUGH else 0)
         
-        try:
-            with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-                loop = asyncio.get_event_loop()
-                data = await loop.run_in_executor(None, lambda: ydl.extract_info(url, download=True))
-                if data and isinstance(data, dict) and 'entries' in data and data['entries']:
-                    data = data['entries'][0]
-        except Exception as e:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise Exception(f"Download failed: {str(e)}")
-        
-        try:
-            with open(temp_path, 'rb') as f:
-                video_bytes = f.read()
-            if len(video_bytes) == 0:
+        # Everything the job writes stays inside its workspace, which is removed on exit.
+        async with self.workspaces.job(reserve=int(reserve)) as workspace:
+            try:
+                loop = asyncio.get_running_loop()
+                async with self.ydl_pool.acquire(
+                    self.get_platform(url),
+                    outtmpl=workspace.path("source.%(ext)s"),
+                    max_filesize=REPLAY_MAX_SOURCE_MB * 1024 * 1024
+                ) as ydl:
+                    with self.metrics.time("download"):
+                        ydl.format_selector = ydl.build_format_selector(plan.format)
+                        data = await loop.run_in_executor(
+                            self.executor, lambda: ydl.process_ie_result(copy.deepcopy(info), download=True)
+                        )
+                        downloads = data.get('requested_downloads') or [{}]
+                        video_path = downloads[0].get('filepath') or ydl.prepare_filename(data)
+                self.metrics.bytes_in += os.stat(video_path).st_size
+                # Direct links often carry no codec info; ffprobe is cheap next to an encode.
+                vcodec = data.get('vcodec') or await probe_video_codec(video_path)
+                mode = route_file(video_path, vcodec)
+                if mode != PASSTHROUGH:
+                    mp4_path = workspace.path("output.mp4")
+                    if mode == REMUX:
+                        passes = [remux_args(video_path, mp4_path)]
+                    else:
+                        passes = encode_passes(video_path, mp4_path, plan.duration, workspace.path("pass"), REPLAY_TWO_PASS)
+                    async with self.transcode_slots:
+                        with self.metrics.time(mode):
+                            for args in passes:
+                                await run_ffmpeg(args)
+                    video_path = mp4_path
+            except Exception as e:
+                self.metrics.outcome("failed")
+                raise Exception(f"Download failed: {str(e)}")
+
+            if os.stat(video_path).st_size == 0:
                 raise Exception("Downloaded file is empty (0 bytes)")
-        finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            try:
+                video_path = await self.cache.put(key, video_path, data, aliases=[url_key])
+            except OSError as e:
+                raise Exception(f"Failed to store video: {e}")
                 
-        return video_bytes, data
+        # The file now lives in the replay cache; callers stream it from disk.
+        return video_path, data
 
     async def suppress_embeds_via_patch(self, interaction: discord.Interaction, message_id: int):
         route = Route(
@@ -116,24 +343,35 @@ class Replay(commands.Cog):
         description="Replay video from TikTok & YouTube Shorts."
     )
     async def replay(self, interaction: discord.Interaction, video_url: str):
-        SUPPORTED_PLATFORMS = ["tiktok.com", "youtube.com/shorts"]
-        if not any(p in video_url.lower() for p in SUPPORTED_PLATFORMS):
+        link = find_video_link(video_url)
+        if link is None:
             return await interaction.response.send_message(
                 "⚠️ Only TikTok and YouTube Shorts are supported!",
                 ephemeral=True
             )
     
         await interaction.response.defer()
+        started = time.perf_counter()
     
+        async def report_position(position: int):
+            await interaction.followup.send(
+                f"⏳ Your replay is queued at position **{position}**.",
+                ephemeral=True
+            )
+    
+        guild_id = interaction.guild_id or interaction.channel_id
         try:
-            video_bytes, info = await self.download_video(video_url)
+            video_path, info = await self.download_video(link.url, guild_id, interaction.user.id, report_position)
+            video_size = os.stat(video_path).st_size
+        except (ReplayQueueFull, PlanError, WorkspaceQuotaExceeded) as e:
+            return await interaction.followup.send(f"⚠️ {e}", ephemeral=True)
         except Exception as e:
             return await interaction.followup.send(
                 f"⚠️ Video download error: ```{str(e)}```",
                 ephemeral=True
             )
     
-        if len(video_bytes) > 25 * 1024 * 1024:
+        if video_size > 25 * 1024 * 1024:
             return await interaction.followup.send(
                 "⚠️ Video exceeds 25MB!",
                 ephemeral=True
@@ -165,43 +403,89 @@ class Replay(commands.Cog):
         )
     
         filename = f"replay_{info['id']}.mp4"
-        file = discord.File(io.BytesIO(video_bytes), filename=filename)
+        file = discord.File(video_path, filename=filename)
     
-        sent_message = await interaction.followup.send(
-            content=message_content,
-            file=file,
-            wait=True
+        with self.metrics.time("upload"):
+            sent_message = await interaction.followup.send(
+                content=message_content,
+                file=file,
+                wait=True
+            )
+        self.metrics.bytes_out += video_size
+        with self.metrics.time("suppress"):
+            await self.suppress_embeds_via_patch(interaction, sent_message.id)
+        self.metrics.record("total", time.perf_counter() - started)
+
+    @app_commands.command(
+        name="autoreplay",
+        description="Enable or disable automatic replay of TikTok & YouTube Shorts links in this server."
+    )
+    @app_commands.describe(enabled="Replay supported links posted in chat")
+    @app_commands.guild_only()
+    @app_commands.default_permissions(manage_guild=True)
+    async def autoreplay(self, interaction: discord.Interaction, enabled: bool):
+        if not interaction.user.guild_permissions.manage_guild:
+            return await interaction.response.send_message(
+                "❌ You do not have **Manage Server** permission to use this command.",
+                ephemeral=True
+            )
+        mongo_handler = getattr(self.bot, "mongo_handler", None)
+        if mongo_handler is None:
+            return await interaction.response.send_message("⚠️ Database is not available.", ephemeral=True)
+        result = await mongo_handler.update_one(
+            "replay", {"_id": interaction.guild_id}, {"$set": {"auto": enabled}}, upsert=True
+        )
+        if result is None:
+            return await interaction.response.send_message("⚠️ Database is not available.", ephemeral=True)
+        if enabled:
+            self.auto_guilds.add(interaction.guild_id)
+        else:
+            self.auto_guilds.discard(interaction.guild_id)
+        await interaction.response.send_message(
+            f"✅ Automatic replay is now **{'enabled' if enabled else 'disabled'}** in this server.",
+            ephemeral=True
         )
-        await self.suppress_embeds_via_patch(interaction, sent_message.id)
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if message.author.bot:
             return
-        SUPPORTED_PLATFORMS = ["tiktok.com", "youtube.com/shorts"]
-        found_url = None
-        for word in message.content.split():
-            for platform in SUPPORTED_PLATFORMS:
-                if platform in word.lower():
-                    found_url = word
-                    break
-            if found_url:
-                break
-        if not found_url:
+        if message.guild is not None and message.guild.id not in self.auto_guilds:
             return
-        try:
-            await message.edit(suppress=True)
-        except Exception:
-            pass
+        link = find_video_link(message.content)
+        if link is None:
+            return
+        found_url = link.url
+        started = time.perf_counter()
+        async def report_position(position: int):
+            await queue_send(
+                self.bot, message.channel, Priority.CHAT,
+                content=f"⏳ Your replay is queued at position **{position}**.",
+                reference=message, mention_author=False, delete_after=10
+            )
+        guild_id = message.guild.id if message.guild else message.channel.id
         try:
             await message.channel.typing()
-            video_bytes, info = await self.download_video(found_url)
+            video_path, info = await self.download_video(found_url, guild_id, message.author.id, report_position)
+            # Open the cached file before the next await: the open handle keeps it readable
+            # even if the cache evicts the entry while the embed edit is in flight.
+            file = discord.File(video_path, filename=f"replay_{info['id']}.mp4")
+            video_size = os.fstat(file.fp.fileno()).st_size
+        except (ReplayQueueFull, PlanError, WorkspaceQuotaExceeded) as e:
+            await queue_send(self.bot, message.channel, Priority.CHAT, content=f"⚠️ {e}")
+            return
         except Exception as e:
-            await message.channel.send(f"⚠️ Video download error: ```{str(e)}```")
+            await queue_send(self.bot, message.channel, Priority.CHAT, content=f"⚠️ Video download error: ```{str(e)}```")
             return
-        if len(video_bytes) > 25 * 1024 * 1024:
-            await message.channel.send("⚠️ Video exceeds 25MB!")
+        if video_size > 25 * 1024 * 1024:
+            file.close()
+            await queue_send(self.bot, message.channel, Priority.CHAT, content="⚠️ Video exceeds 25MB!")
             return
+        # Only hide the original embed once there is a video to replace it with.
+        try:
+            await message.edit(suppress=True)
+        except Exception:
+            pass
         timestamp_val = None
         upload_date = info.get('upload_date') or info.get('release_date')
         if upload_date:
@@ -225,21 +509,39 @@ class Replay(commands.Cog):
             f"{video_title} (Uploaded: {time_str})\n"
             f"-# [↪ Original link]({video_link})"
         )
-        filename = f"replay_{info['id']}.mp4"
-        file = discord.File(io.BytesIO(video_bytes), filename=filename)
-        sent_message = await message.channel.send(content=message_content, file=file)
         try:
-            await sent_message.edit(suppress=True)
-        except Exception:
+            with self.metrics.time("upload"):
+                sent_message = await queue_send(self.bot, message.channel, Priority.CHAT, content=message_content, file=file)
+        finally:
+            file.close()
+        if sent_message is None:
+            return
+        self.metrics.bytes_out += video_size
+        with self.metrics.time("suppress"):
             try:
-                route = Route(
-                    "PATCH",
-                    f"/channels/{sent_message.channel.id}/messages/{sent_message.id}"
-                )
-                payload = {"flags": 4}
-                await self.bot.http.request(route, json=payload)
+                await sent_message.edit(suppress=True)
             except Exception:
-                pass
+                try:
+                    route = Route(
+                        "PATCH",
+                        f"/channels/{sent_message.channel.id}/messages/{sent_message.id}"
+                    )
+                    payload = {"flags": 4}
+                    await self.bot.http.request(route, json=payload)
+                except Exception:
+                    pass
+        self.metrics.record("total", time.perf_counter() - started)
+
+    @commands.command(name="replaystats", hidden=True)
+    @commands.is_owner()
+    async def replay_stats(self, ctx: commands.Context):
+        await ctx.send(
+            f"```\n{self.metrics.format()}\n"
+            f"cache: {self.cache.stats()}\n"
+            f"queue: {self.jobs.stats()}\n"
+            f"workspaces: {self.workspaces.stats()}\n"
+            f"yt-dlp pool: {self.ydl_pool.stats()}\n```"
+        )
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Replay(bot))
@@ -1,16 +1,37 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 import aiohttp
+import asyncio
 import os
 import math
+import time
 import unicodedata
-from typing import Tuple, Optional
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple, Optional
 from datetime import datetime, timedelta, timezone
 
 os.makedirs("assets", exist_ok=True)
 
 API_KEY = os.getenv("2f85f23cf7afe5babe7864e4d48c30a6", "4403f29d9c27407f23a50a1eb61bafec")
+API_BASE = os.getenv("OWM_API_BASE", "https://api.openweathermap.org/data/2.5").rstrip("/")
+GEO_BASE = os.getenv("OWM_GEO_BASE", "https://api.openweathermap.org/geo/1.0").rstrip("/")
+WEATHER_HTTP_PER_HOST = int(os.getenv("WEATHER_HTTP_PER_HOST", "8"))
+WEATHER_HTTP_TIMEOUT = float(os.getenv("WEATHER_HTTP_TIMEOUT", "10"))
+WEATHER_CALL_TIMEOUT = float(os.getenv("WEATHER_CALL_TIMEOUT", "3"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "500"))
+WEATHER_PREWARM = os.getenv("WEATHER_PREWARM", "0") == "1"
+WEATHER_PREWARM_BUDGET = int(os.getenv("WEATHER_PREWARM_BUDGET", "30"))
+GROUP_SIZE = 20
+# Seconds each kind of answer stays fresh. OWM refreshes current conditions about every
+# 10 minutes, UV and air quality hourly, and the 3-hourly forecast a few times a day.
+CACHE_TTLS = {
+    "current": float(os.getenv("WEATHER_TTL_CURRENT", "600")),
+    "extremes": float(os.getenv("WEATHER_TTL_CURRENT", "600")),
+    "uv": float(os.getenv("WEATHER_TTL_AIR", "1800")),
+    "air": float(os.getenv("WEATHER_TTL_AIR", "1800")),
+    "forecast": float(os.getenv("WEATHER_TTL_FORECAST", "3600")),
+}
 
 CITIES = [
     "Long Xuyên", "Vũng Tàu", "Bắc Giang", "Bắc Kạn", "Bạc Liêu", "Bắc Ninh",
@@ -89,65 +110,74 @@ def date_to_weekday(date_str: str) -> str:
     }
     return mapping.get(weekday, date_str)
 
-async def fetch_weather(city: str) -> Optional[dict]:
-    weather_url = "https://api.openweathermap.org/data/2.5/weather"
-    params_weather = {
+def location_params(city: str, lat: float = None, lon: float = None) -> dict:
+    # Known coordinates skip OWM's name lookup; the city name is only the fallback.
+    if lat is not None and lon is not None:
+        return {"lat": lat, "lon": lon}
+    return {"q": f"{city},VN"}
+
+async def fetch_coordinates(session: aiohttp.ClientSession, city: str) -> Optional[Tuple[float, float]]:
+    geo_url = f"{GEO_BASE}/direct"
+    params_geo = {
         "q": f"{city},VN",
+        "limit": 1,
+        "appid": API_KEY
+    }
+    try:
+        async with session.get(geo_url, params=params_geo) as response:
+            if response.status != 200:
+                return None
+            data = await response.json()
+    except Exception:
+        return None
+    if not data or data[0].get("lat") is None or data[0].get("lon") is None:
+        return None
+    return data[0]["lat"], data[0]["lon"]
+
+async def fetch_weather(session: aiohttp.ClientSession, city: str, lat: float = None, lon: float = None) -> Optional[dict]:
+    weather_url = f"{API_BASE}/weather"
+    params_weather = {
+        **location_params(city, lat, lon),
         "appid": API_KEY,
         "units": "metric",
         "lang": "en"
     }
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(weather_url, params=params_weather) as response:
-                if response.status != 200:
-                    return None
-                data = await response.json()
-                main = data.get("main", {})
-                weather = data.get("weather", [{}])[0]
-                wind = data.get("wind", {})
-                sys = data.get("sys", {})
-                coord = data.get("coord", {})
+        async with session.get(weather_url, params=params_weather) as response:
+            if response.status != 200:
+                return None
+            data = await response.json()
+    except asyncio.TimeoutError:
+        # A slow OWM is not an unknown city; let the caller tell the two apart.
+        raise
     except Exception:
         return None
+    return parse_weather(data)
 
-    lat = coord.get("lat")
-    lon = coord.get("lon")
-    uv_index = None
-    aqi_value = None
-    aqi_desc = "Unknown"
-    if lat is not None and lon is not None:
-        uv_url = "https://api.openweathermap.org/data/2.5/uvi"
-        params_uv = {
-            "lat": lat,
-            "lon": lon,
-            "appid": API_KEY
-        }
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(uv_url, params=params_uv) as response_uv:
-                    if response_uv.status == 200:
-                        data_uv = await response_uv.json()
-                        uv_index = data_uv.get("value")
-        except Exception:
-            uv_index = None
-
-        air_url = "https://api.openweathermap.org/data/2.5/air_pollution"
-        params_air = {
-            "lat": lat,
-            "lon": lon,
-            "appid": API_KEY
-        }
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(air_url, params=params_air) as response_air:
-                    if response_air.status == 200:
-                        data_air = await response_air.json()
-                        api_aqi = data_air.get("list", [{}])[0].get("main", {}).get("aqi")
-                        aqi_value, aqi_desc = convert_owm_aqi(api_aqi)
-        except Exception:
-            aqi_value = None
+async def fetch_group(session: aiohttp.ClientSession, city_ids: list) -> Dict[int, dict]:
+    # OWM answers up to 20 city ids in one call, each in the /weather format.
+    group_url = f"{API_BASE}/group"
+    params_group = {
+        "id": ",".join(str(city_id) for city_id in city_ids),
+        "appid": API_KEY,
+        "units": "metric",
+        "lang": "en"
+    }
+    try:
+        async with session.get(group_url, params=params_group) as response:
+            if response.status != 200:
+                return {}
+            data = await response.json()
+    except Exception:
+        return {}
+    return {item.get("id"): parse_weather(item) for item in data.get("list", [])}
 
+def parse_weather(data: dict) -> dict:
+    main = data.get("main", {})
+    weather = data.get("weather", [{}])[0]
+    wind = data.get("wind", {})
+    sys = data.get("sys", {})
+    coord = data.get("coord", {})
     wind_deg = wind.get("deg")
     wind_direction = deg_to_compass(wind_deg) if wind_deg is not None else "N/A"
 
@@ -161,19 +191,50 @@ async def fetch_weather(city: str) -> Optional[dict]:
         "cloudness": weather.get("description"),
         "icon": weather.get("icon"),
         "country": sys.get("country"),
-        "uv_index": uv_index,
-        "aqi": aqi_value,
-        "aqi_desc": aqi_desc,
+        "lat": coord.get("lat"),
+        "lon": coord.get("lon"),
+        "city_id": data.get("id")
+    }
+
+async def fetch_uv_index(session: aiohttp.ClientSession, lat: float, lon: float) -> Optional[float]:
+    uv_url = f"{API_BASE}/uvi"
+    params_uv = {
+        "lat": lat,
+        "lon": lon,
+        "appid": API_KEY
+    }
+    try:
+        async with session.get(uv_url, params=params_uv) as response_uv:
+            if response_uv.status != 200:
+                return None
+            data_uv = await response_uv.json()
+            return data_uv.get("value")
+    except Exception:
+        return None
+
+async def fetch_air_quality(session: aiohttp.ClientSession, lat: float, lon: float) -> Tuple[Optional[int], str]:
+    air_url = f"{API_BASE}/air_pollution"
+    params_air = {
         "lat": lat,
-        "lon": lon
+        "lon": lon,
+        "appid": API_KEY
     }
+    try:
+        async with session.get(air_url, params=params_air) as response_air:
+            if response_air.status != 200:
+                return None, "Unknown"
+            data_air = await response_air.json()
+            api_aqi = data_air.get("list", [{}])[0].get("main", {}).get("aqi")
+            return convert_owm_aqi(api_aqi)
+    except Exception:
+        return None, "Unknown"
 
-async def fetch_day_extremes(lat: float, lon: float) -> Tuple[Optional[float], Optional[float]]:
+async def fetch_day_extremes(session: aiohttp.ClientSession, lat: float, lon: float) -> Tuple[Optional[float], Optional[float]]:
     tz = timezone(timedelta(hours=7))
     now = datetime.now(tz)
     today_midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
     dt_timestamp = int(now.timestamp())
-    timemachine_url = "https://api.openweathermap.org/data/2.5/onecall/timemachine"
+    timemachine_url = f"{API_BASE}/onecall/timemachine"
     params = {
         "lat": lat,
         "lon": lon,
@@ -182,11 +243,10 @@ async def fetch_day_extremes(lat: float, lon: float) -> Tuple[Optional[float], O
         "units": "metric"
     }
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(timemachine_url, params=params) as response:
-                if response.status != 200:
-                    return None, None
-                data = await response.json()
+        async with session.get(timemachine_url, params=params) as response:
+            if response.status != 200:
+                return None, None
+            data = await response.json()
     except Exception:
         return None, None
     hourly = data.get("hourly", [])
@@ -200,20 +260,19 @@ async def fetch_day_extremes(lat: float, lon: float) -> Tuple[Optional[float], O
     else:
         return None, None
 
-async def fetch_forecast(city: str) -> list:
-    forecast_url = "https://api.openweathermap.org/data/2.5/forecast"
+async def fetch_forecast(session: aiohttp.ClientSession, city: str, lat: float = None, lon: float = None) -> list:
+    forecast_url = f"{API_BASE}/forecast"
     params_forecast = {
-        "q": f"{city},VN",
+        **location_params(city, lat, lon),
         "appid": API_KEY,
         "units": "metric",
         "lang": "vi"
     }
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(forecast_url, params=params_forecast) as response:
-                if response.status != 200:
-                    return []
-                data = await response.json()
+        async with session.get(forecast_url, params=params_forecast) as response:
+            if response.status != 200:
+                return []
+            data = await response.json()
     except Exception:
         return []
     
@@ -250,9 +309,387 @@ async def fetch_forecast(city: str) -> list:
         })
     return forecast_results
 
+def city_key(city: str) -> str:
+    return " ".join(remove_accents(city).lower().split())
+
+class WeatherCache:
+    """TTL + LRU cache with stale-while-revalidate for one kind of OWM answer.
+
+    A fresh entry is returned as-is. Past its TTL it is still returned for another TTL
+    while a single background fetch replaces it; after that the caller waits for the
+    fetch. Concurrent misses for a key share one fetch, and fallbacks are never stored.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 500):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable], default):
+        entry = self._entries.get(key)
+        age = time.monotonic() - entry[1] if entry else None
+        if entry and age < 2 * self.ttl:
+            self._entries.move_to_end(key)
+            if age < self.ttl:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self.refresh(key, fetch, default)
+            return entry[0]
+        self.misses += 1
+        return await asyncio.shield(self.refresh(key, fetch, default))
+
+    def peek(self, key: str):
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def expires_in(self, key: str) -> float:
+        entry = self._entries.get(key)
+        if entry is None:
+            return float("-inf")
+        return entry[1] + self.ttl - time.monotonic()
+
+    def put(self, key: str, value) -> None:
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def refresh(self, key: str, fetch: Callable[[], Awaitable], default) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, fetch, default))
+            # Background refreshes may have nobody awaiting them; a failure just keeps the old entry.
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def _fetch(self, key: str, fetch: Callable[[], Awaitable], default):
+        try:
+            value = await fetch()
+            if value != default:
+                self.put(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def close(self) -> None:
+        for task in self._inflight.values():
+            task.cancel()
+        self._inflight.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+async def _within(coro, default):
+    # A late or failed side call degrades to its default instead of holding up the reply.
+    # The current weather is not a side call: it only has the session timeout.
+    try:
+        return await asyncio.wait_for(coro, WEATHER_CALL_TIMEOUT)
+    except Exception:
+        return default
+
+class GeocodeStore:
+    """Normalized city name -> (lat, lon).
+
+    Cities from `known` (the CITIES table) are mirrored to the "geocode" collection and
+    never expire, since coordinates do not change. Anything else users type is kept in
+    memory only, in an LRU of at most `max_learned` entries, so free-form input cannot
+    grow the database.
+    """
+
+    def __init__(self, mongo_handler=None, known: Iterable[str] = (), max_learned: int = 1000):
+        self.mongo_handler = mongo_handler
+        self.known = {city_key(remove_accents(city)): remove_accents(city) for city in known}
+        self.max_learned = max_learned
+        self._coords: Dict[str, Tuple[float, float]] = {}
+        self._learned: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._attempted: set = set()
+        self._pending: set = set()
+
+    def get(self, key: str) -> Optional[Tuple[float, float]]:
+        coord = self._coords.get(key)
+        if coord is None:
+            coord = self._learned.get(key)
+            if coord is not None:
+                self._learned.move_to_end(key)
+        return coord
+
+    def __len__(self) -> int:
+        return len(self._coords) + len(self._learned)
+
+    def missing(self) -> List[str]:
+        return [key for key in self.known if key not in self._coords and key not in self._attempted]
+
+    async def load(self) -> None:
+        if self.mongo_handler is None or not self.known:
+            return
+        try:
+            docs = await self.mongo_handler.find(
+                "geocode", {"_id": {"$in": list(self.known)}}, {"lat": 1, "lon": 1}
+            )
+        except Exception as e:
+            print(f"Failed to load geocode store: {e}")
+            return
+        for doc in docs:
+            self._coords.setdefault(doc["_id"], (doc["lat"], doc["lon"]))
+
+    def add(self, key: str, lat: float, lon: float) -> None:
+        if key in self._coords:
+            return
+        if key not in self.known:
+            self._learned[key] = (lat, lon)
+            self._learned.move_to_end(key)
+            while len(self._learned) > self.max_learned:
+                self._learned.popitem(last=False)
+            return
+        self._coords[key] = (lat, lon)
+        if self.mongo_handler is not None:
+            task = asyncio.create_task(self._save(key, lat, lon))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _save(self, key: str, lat: float, lon: float) -> None:
+        try:
+            await self.mongo_handler.update_one(
+                "geocode", {"_id": key}, {"$set": {"lat": lat, "lon": lon}}, upsert=True
+            )
+        except Exception as e:
+            print(f"Failed to save coordinates for {key}: {e}")
+
+    async def seed(self, session: aiohttp.ClientSession, limit: int) -> int:
+        """Geocodes up to `limit` known cities the store lacks and returns the calls made.
+        A city that fails is not retried until the next load; /weather still learns it."""
+        batch = self.missing()[:max(limit, 0)]
+        self._attempted.update(batch)
+        results = await asyncio.gather(
+            *(_within(fetch_coordinates(session, self.known[key]), None) for key in batch)
+        )
+        for key, coord in zip(batch, results):
+            if coord is not None:
+                self.add(key, *coord)
+        return len(batch)
+
+TIER_DEFAULTS = {
+    "current": None,
+    "extremes": (None, None),
+    "uv": None,
+    "air": (None, "Unknown"),
+    "forecast": [],
+}
+
+def fetch_tier(session: aiohttp.ClientSession, tier: str, city: str, lat: float = None, lon: float = None) -> Awaitable:
+    # Only the optional tiers get the short per-call timeout; see _within.
+    if tier == "current":
+        return fetch_weather(session, city, lat, lon)
+    if tier == "forecast":
+        fetch = fetch_forecast(session, city, lat, lon)
+    elif tier == "uv":
+        fetch = fetch_uv_index(session, lat, lon)
+    elif tier == "air":
+        fetch = fetch_air_quality(session, lat, lon)
+    else:
+        fetch = fetch_day_extremes(session, lat, lon)
+    return _within(fetch, TIER_DEFAULTS[tier])
+
+async def fetch_report(
+    session: aiohttp.ClientSession,
+    city: str,
+    caches: Optional[Dict[str, WeatherCache]] = None,
+    geocodes: Optional[GeocodeStore] = None
+) -> Optional[dict]:
+    """Current weather plus UV, air quality, today's extremes and the forecast.
+
+    With the city's coordinates in `geocodes`, all five calls start at once. Otherwise
+    the forecast starts right away, and the calls that need coordinates start together
+    once the current weather has them, which also teaches `geocodes` the city. The
+    optional calls have their own short timeout and fall back to a default; a missing
+    current weather returns None, and a timed-out one raises asyncio.TimeoutError.
+    With `caches`, each call is served from its own tier when possible.
+    """
+    key = city_key(city)
+
+    async def call(tier: str, lat: float = None, lon: float = None):
+        fetch = lambda: fetch_tier(session, tier, city, lat, lon)
+        if caches is None:
+            return await fetch()
+        return await caches[tier].get(key, fetch, TIER_DEFAULTS[tier])
+
+    coord = geocodes.get(key) if geocodes is not None else None
+    if coord is not None:
+        current, forecast, uv_index, air, extremes = await asyncio.gather(
+            call("current", *coord),
+            call("forecast", *coord),
+            call("uv", *coord),
+            call("air", *coord),
+            call("extremes", *coord),
+            return_exceptions=True
+        )
+        if isinstance(current, BaseException):
+            raise current
+        if not current or current["temperature"] is None:
+            return None
+    else:
+        forecast_task = asyncio.create_task(call("forecast"))
+        try:
+            current = await call("current")
+        except BaseException:
+            forecast_task.cancel()
+            raise
+        if not current or current["temperature"] is None:
+            forecast_task.cancel()
+            return None
+
+        lat = current.get("lat")
+        lon = current.get("lon")
+        uv_index, air, extremes = None, (None, "Unknown"), (None, None)
+        if lat is not None and lon is not None:
+            if geocodes is not None:
+                geocodes.add(key, lat, lon)
+            uv_index, air, extremes = await asyncio.gather(
+                call("uv", lat, lon),
+                call("air", lat, lon),
+                call("extremes", lat, lon)
+            )
+        forecast = await forecast_task
+    # Cached dicts are shared between commands; build the report on a copy.
+    return {
+        **current,
+        "uv_index": uv_index,
+        "aqi": air[0],
+        "aqi_desc": air[1],
+        "day_max": extremes[0],
+        "day_min": extremes[1],
+        "forecast": forecast,
+    }
+
 class WeatherCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.caches = {tier: WeatherCache(ttl, WEATHER_CACHE_SIZE) for tier, ttl in CACHE_TTLS.items()}
+        # OWM city ids learned from /weather answers, so later refreshes can go through /group.
+        self.city_ids: Dict[str, int] = {}
+        self.geocodes = GeocodeStore(getattr(bot, "mongo_handler", None), CITIES)
+        self.geocode_task: Optional[asyncio.Task] = None
+        self.prewarm_calls = 0
+
+    async def cog_load(self):
+        # One keep-alive pool for every OWM call, so a command reuses warm connections
+        # instead of paying a DNS lookup and TLS handshake per request.
+        connector = aiohttp.TCPConnector(
+            limit_per_host=WEATHER_HTTP_PER_HOST,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=WEATHER_HTTP_TIMEOUT)
+        )
+        self.geocode_task = asyncio.create_task(self.geocodes.load())
+        if WEATHER_PREWARM:
+            self.prewarm.start()
+        else:
+            self.geocoder.start()
+
+    async def seed_geocodes(self, budget: int) -> int:
+        # CITIES missing from the store are geocoded out of the same per-run API budget.
+        await self.geocode_task
+        calls = await self.geocodes.seed(self.session, budget)
+        if calls:
+            print(f"Geocoded {calls} cities, {len(self.geocodes.missing())} left")
+        return calls
+
+    @tasks.loop(minutes=1)
+    async def geocoder(self):
+        # Seeds the store when the prewarm loop, which otherwise does it, is off.
+        await self.seed_geocodes(WEATHER_PREWARM_BUDGET)
+        if not self.geocodes.missing():
+            self.geocoder.stop()
+
+    async def cog_unload(self):
+        self.prewarm.cancel()
+        self.geocoder.cancel()
+        if self.geocode_task is not None:
+            self.geocode_task.cancel()
+        for cache in self.caches.values():
+            cache.close()
+        print(f"Weather cache stats: {self.cache_stats()}")
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    @tasks.loop(minutes=1)
+    async def prewarm(self):
+        """Refreshes the CITIES table before entries expire, spending at most
+        WEATHER_PREWARM_BUDGET OWM calls per run. Entries closest to expiry go first,
+        so the work spreads itself over the runs instead of arriving in bursts."""
+        budget = WEATHER_PREWARM_BUDGET
+        budget -= await self.seed_geocodes(budget)
+        margin = 2 * self.prewarm.minutes * 60
+        cities = {city_key(remove_accents(city)): remove_accents(city) for city in CITIES}
+        current = self.caches["current"]
+        coords = {}
+        for key in cities:
+            report = current.peek(key) or {}
+            if report.get("city_id"):
+                self.city_ids[key] = report["city_id"]
+            if self.geocodes.get(key) is None and report.get("lat") is not None and report.get("lon") is not None:
+                self.geocodes.add(key, report["lat"], report["lon"])
+            coords[key] = self.geocodes.get(key)
+
+        due = sorted((key for key in cities if current.expires_in(key) < margin), key=current.expires_in)
+        known = [key for key in due if key in self.city_ids]
+        for i in range(0, len(known), GROUP_SIZE):
+            if budget <= 0:
+                return
+            batch = known[i:i + GROUP_SIZE]
+            budget -= 1
+            self.prewarm_calls += 1
+            reports = await _within(fetch_group(self.session, [self.city_ids[key] for key in batch]), {})
+            for key in batch:
+                report = reports.get(self.city_ids[key])
+                if report and report["temperature"] is not None:
+                    current.put(key, report)
+
+        jobs = [("current", key) for key in due if key not in self.city_ids]
+        for tier in ("extremes", "uv", "air", "forecast"):
+            cache = self.caches[tier]
+            for key in cities:
+                if cache.expires_in(key) >= margin:
+                    continue
+                if tier != "forecast" and coords[key] is None:
+                    continue
+                jobs.append((tier, key))
+        jobs.sort(key=lambda job: (job[0] != "current", self.caches[job[0]].expires_in(job[1])))
+        jobs = jobs[:max(budget, 0)]
+        self.prewarm_calls += len(jobs)
+
+        def refresh(tier: str, key: str):
+            lat, lon = coords[key] or (None, None)
+            fetch = lambda: fetch_tier(self.session, tier, cities[key], lat, lon)
+            return self.caches[tier].refresh(key, fetch, TIER_DEFAULTS[tier])
+
+        # A city whose current weather timed out keeps its old entry until the next run.
+        await asyncio.gather(*(refresh(tier, key) for tier, key in jobs), return_exceptions=True)
+
+    @prewarm.error
+    async def prewarm_error(self, error: Exception):
+        print(f"Weather prewarm failed: {error}")
+
+    def cache_stats(self) -> dict:
+        return {tier: cache.stats() for tier, cache in self.caches.items()}
 
     @app_commands.command(name="weather", description="Weather forecast")
     @app_commands.describe(city="City name")
@@ -260,16 +697,17 @@ class WeatherCog(commands.Cog):
         await interaction.response.defer()
 
         city_normalized = remove_accents(city)
-        weather_data = await fetch_weather(city_normalized)
-        if not weather_data or weather_data["temperature"] is None:
+        try:
+            weather_data = await fetch_report(self.session, city_normalized, self.caches, self.geocodes)
+        except asyncio.TimeoutError:
+            await interaction.followup.send("The weather service timed out, please try again later!")
+            return
+        if not weather_data:
             await interaction.followup.send("Location not found!")
             return
 
-        lat = weather_data.get("lat")
-        lon = weather_data.get("lon")
-        day_max, day_min = None, None
-        if lat is not None and lon is not None:
-            day_max, day_min = await fetch_day_extremes(lat, lon)
+        day_max = weather_data["day_max"]
+        day_min = weather_data["day_min"]
         if day_max is None or day_min is None:
             day_max = weather_data.get("temperature")
             day_min = weather_data.get("temperature")
@@ -306,7 +744,7 @@ class WeatherCog(commands.Cog):
         embed.set_footer(text="Information may not be completely accurate!", 
                          icon_url=self.bot.user.display_avatar.url if self.bot.user else None)
 
-        forecast_data = await fetch_forecast(city_normalized)
+        forecast_data = weather_data["forecast"]
         if forecast_data:
             forecast_str = ""
             for fc in forecast_data:
@@ -335,6 +773,12 @@ class WeatherCog(commands.Cog):
             for city in CITIES if current.lower() in city.lower()
         ][:25]
 
+    @commands.command(name="weatherstats", hidden=True)
+    @commands.is_owner()
+    async def weather_stats(self, ctx: commands.Context):
+        lines = [f"{tier:<9} {stats}" for tier, stats in self.cache_stats().items()]
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
     async def cog_app_command_error(self, interaction: discord.Interaction, error: Exception):
         try:
             await interaction.followup.send("An error occurred while processing your request.", ephemeral=True)
@@ -8,8 +8,8 @@ import discord
 from discord.ext import commands, tasks
 from discord import Activity, ActivityType
 from dotenv import load_dotenv
-from pymongo import MongoClient
 from utils.mongo_handler import MongoHandler
+from utils.send_queue import SendQueue, Priority, queue_send
 
 #ENVIRONMENT
 def get_env_var(name, default=None, required=False, cast_type=None):
@@ -51,6 +51,14 @@ class CustomBot(commands.Bot):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.mongo_handler: Union[MongoHandler, None] = None
+        self.send_queue = SendQueue()
+
+    async def setup_hook(self):
+        if self.mongo_handler is not None:
+            if await self.mongo_handler.ping():
+                await self.mongo_handler.ensure_indexes()
+                await self.mongo_handler.load_ban_filter()
+            self.mongo_handler.write_buffer.start()
 
 #BOT INITIALIZATION
 bot = CustomBot(
@@ -90,11 +98,15 @@ async def keep_mongo_connection():
     mongo_handler = getattr(bot, 'mongo_handler', None)
     if mongo_handler is not None and hasattr(mongo_handler, 'client') and mongo_handler.client is not None:
         try:
-            mongo_handler.client.admin.command('ping')
+            await mongo_handler.client.admin.command('ping')
         except Exception as e:
             logger.error(f"MongoDB connection lost: {e}. Reconnecting...")
             if hasattr(mongo_handler, 'reconnect'):
-                await mongo_handler.reconnect()
+                if not await mongo_handler.reconnect():
+                    return
+        if not mongo_handler.indexes_ready:
+            await mongo_handler.ensure_indexes()
+        await mongo_handler.refresh_ban_filter()
 
 #BOT EVENTS
 @bot.event
@@ -154,7 +166,7 @@ async def log_to_channel(content, channel_id=ONLINE_CHANNEL_ID):
     from discord import TextChannel
     if isinstance(channel, TextChannel):
         try:
-            await channel.send(content)
+            await queue_send(bot, channel, Priority.LOG, content=content)
         except Exception as e:
             logger.error(f"Failed to log to channel: {str(e)}")
 
@@ -175,8 +187,7 @@ async def is_user_banned(user_id):
     mongo_handler = getattr(bot, 'mongo_handler', None)
     if mongo_handler is None:
         return False
-    user_data = await bot.loop.run_in_executor(None, mongo_handler.get_user_data, str(user_id))
-    return user_data.get('banned', False)
+    return await mongo_handler.is_user_banned(str(user_id))
 
 #LOAD INITIAL COGS
 async def load_initial_cogs():
@@ -209,8 +220,11 @@ async def main():
     finally:
         mongo_handler = getattr(bot, 'mongo_handler', None)
         if mongo_handler:
-            mongo_handler.close_connection()
+            await mongo_handler.write_buffer.stop()
+            logger.info(f"Write-behind buffer stats: {mongo_handler.write_buffer.stats()}")
+            await mongo_handler.close_connection()
         await log_to_channel("❌ Bot stopped")
+        logger.info(f"Send queue stats: {bot.send_queue.stats()}")
         logger.info("Bot stopped")
 
 if __name__ == '__main__':
@@ -0,0 +1,94 @@
+import time
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Union
+
+_GOLDEN = 0x9E3779B97F4A7C15
+_MIN_BITS = 1 << 16
+_BITS_PER_ID = 16
+
+class BanFilter:
+    """Sorted int64 array of banned user ids with a one-hash bitmap in front.
+
+    The bitmap answers "definitely not banned" in O(1); only bitmap hits pay for
+    the binary search, which is exact.
+    """
+
+    def __init__(self):
+        self._ids = array('q')
+        self._bits = bytearray(_MIN_BITS // 8)
+        self._shift = 64 - (_MIN_BITS.bit_length() - 1)
+        self.loaded = False
+        self.loaded_at = 0.0
+
+    def _slot(self, value: int) -> int:
+        return ((value * _GOLDEN) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+
+    def _rebuild_bits(self) -> None:
+        nbits = _MIN_BITS
+        while nbits < len(self._ids) * _BITS_PER_ID:
+            nbits <<= 1
+        self._bits = bytearray(nbits // 8)
+        self._shift = 64 - (nbits.bit_length() - 1)
+        for value in self._ids:
+            slot = self._slot(value)
+            self._bits[slot >> 3] |= 1 << (slot & 7)
+
+    @staticmethod
+    def _to_int(user_id: Union[int, str]):
+        try:
+            return int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+    def load(self, user_ids: Iterable[Union[int, str]]) -> None:
+        ids = {self._to_int(user_id) for user_id in user_ids}
+        ids.discard(None)
+        self._ids = array('q', sorted(ids))
+        self._rebuild_bits()
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+
+    def age(self) -> float:
+        """Seconds since the last successful load(), or infinity if it never loaded."""
+        if not self.loaded:
+            return float("inf")
+        return time.monotonic() - self.loaded_at
+
+    def add(self, user_id: Union[int, str]) -> None:
+        value = self._to_int(user_id)
+        if value is None:
+            return
+        idx = bisect_left(self._ids, value)
+        if idx == len(self._ids) or self._ids[idx] != value:
+            self._ids.insert(idx, value)
+            if len(self._ids) * _BITS_PER_ID > len(self._bits) * 8:
+                self._rebuild_bits()
+            else:
+                slot = self._slot(value)
+                self._bits[slot >> 3] |= 1 << (slot & 7)
+
+    def discard(self, user_id: Union[int, str]) -> None:
+        value = self._to_int(user_id)
+        if value is None:
+            return
+        idx = bisect_left(self._ids, value)
+        if idx < len(self._ids) and self._ids[idx] == value:
+            del self._ids[idx]
+
+    def __contains__(self, user_id: Union[int, str]) -> bool:
+        value = self._to_int(user_id)
+        if value is None:
+            return False
+        slot = self._slot(value)
+        if not self._bits[slot >> 3] & (1 << (slot & 7)):
+            return False
+        idx = bisect_left(self._ids, value)
+        return idx < len(self._ids) and self._ids[idx] == value
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self._ids.buffer_info()[1] * self._ids.itemsize + len(self._bits)
@@ -0,0 +1,47 @@
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+EMBED_PLACEHOLDER = re.compile(r"\{embed:([^}]+)\}")
+
+def normalize_embed_name(name: str) -> str:
+    return name.casefold()
+
+class EmbedResolver:
+    """Resolves {embed:name} references with one $in query per guild, behind a per-guild doc cache."""
+
+    def __init__(self, mongo_handler, max_guilds: int = 5000):
+        self.mongo_handler = mongo_handler
+        self.max_guilds = max_guilds
+        self._guilds: "OrderedDict[int, Dict[str, Optional[dict]]]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self.queries = 0
+
+    async def resolve(self, guild_id: int, names: Iterable[str]) -> List[dict]:
+        keys = [normalize_embed_name(name) for name in names]
+        if not keys:
+            return []
+        cached = self._guilds.get(guild_id, {})
+        missing = [key for key in dict.fromkeys(keys) if key not in cached]
+        if missing:
+            generation = self._generations.get(guild_id, 0)
+            self.queries += 1
+            docs = await self.mongo_handler.find("embed", {"guild_id": guild_id, "name_lower": {"$in": missing}})
+            found = {doc.get("name_lower"): doc for doc in docs}
+            cached = dict(self._guilds.get(guild_id, {}))
+            for key in missing:
+                cached[key] = found.get(key)
+            if self._generations.get(guild_id, 0) == generation:
+                self._guilds[guild_id] = cached
+                while len(self._guilds) > self.max_guilds:
+                    self._guilds.popitem(last=False)
+        if guild_id in self._guilds:
+            self._guilds.move_to_end(guild_id)
+        return [cached[key] for key in keys if cached.get(key) is not None]
+
+    async def resolve_text(self, guild_id: int, text: str) -> List[dict]:
+        return await self.resolve(guild_id, EMBED_PLACEHOLDER.findall(text))
+
+    def invalidate(self, guild_id: int) -> None:
+        self._guilds.pop(guild_id, None)
+        self._generations[guild_id] = self._generations.get(guild_id, 0) + 1
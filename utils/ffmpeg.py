@@ -0,0 +1,40 @@
+import asyncio
+from typing import Optional, Sequence
+
+FFMPEG_BINARY = "ffmpeg"
+FFPROBE_BINARY = "ffprobe"
+
+class FFmpegError(Exception):
+    pass
+
+async def run_ffmpeg(args: Sequence[str]) -> None:
+    """Runs ffmpeg as a child process so encoding never occupies a Python thread."""
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-nostdin", "-y", *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        message = stderr.decode(errors="replace").strip().splitlines()
+        raise FFmpegError(message[-1] if message else f"ffmpeg exited with code {process.returncode}")
+
+async def probe_video_codec(path: str) -> Optional[str]:
+    """Returns the codec name of the first video stream, or None when ffprobe cannot tell."""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=codec_name", "-of", "csv=p=0", path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+    except OSError:
+        return None
+    stdout, _ = await process.communicate()
+    codec = stdout.decode(errors="replace").strip()
+    return codec or None
@@ -0,0 +1,59 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Optional
+
+class GuildConfigCache:
+    """Lazily loaded per-guild snapshot of a config collection keyed by guild _id.
+
+    Entries never expire on their own; the commands that write the collection
+    call invalidate() so the next read reloads it. Missing configs are cached too.
+    """
+
+    def __init__(self, mongo_handler, collection: str, max_size: int = 20000):
+        self.mongo_handler = mongo_handler
+        self.collection = collection
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, Optional[dict]]" = OrderedDict()
+        self._loading: Dict[int, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, guild_id: int) -> Optional[dict]:
+        if guild_id in self._entries:
+            self._entries.move_to_end(guild_id)
+            self.hits += 1
+            return self._entries[guild_id]
+        self.misses += 1
+        future = self._loading.get(guild_id)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._loading[guild_id] = future
+        try:
+            doc = await self.mongo_handler.find_one(self.collection, {"_id": guild_id})
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(doc)
+            if self._loading.get(guild_id) is future:
+                self._store(guild_id, doc)
+            return doc
+        finally:
+            if self._loading.get(guild_id) is future:
+                del self._loading[guild_id]
+
+    def _store(self, guild_id: int, doc: Optional[dict]) -> None:
+        self._entries[guild_id] = doc
+        self._entries.move_to_end(guild_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, guild_id: int) -> None:
+        self._entries.pop(guild_id, None)
+        self._loading.pop(guild_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._loading.clear()
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List
+
+logger = logging.getLogger(__name__)
+
+BURST_WINDOW = 5.0
+DEFAULT_BURST_THRESHOLD = 5
+
+class BurstCoalescer:
+    """Buffers member events per guild once they arrive faster than a threshold per window.
+
+    Below the threshold offer() returns False and the caller handles the event as usual.
+    Once a guild bursts, members are collected for one window and handed to flush together.
+    """
+
+    def __init__(self, flush: Callable[[int, list], Awaitable[None]], window: float = BURST_WINDOW):
+        self.flush = flush
+        self.window = window
+        self._recent: Dict[int, Deque[float]] = {}
+        self._pending: Dict[int, List] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._pruned_at = 0.0
+        self.coalesced = 0
+        self.batches = 0
+
+    def offer(self, guild_id: int, member, threshold: int) -> bool:
+        now = time.monotonic()
+        if now - self._pruned_at >= self.window:
+            self._prune(now)
+        recent = self._recent.setdefault(guild_id, deque())
+        recent.append(now)
+        while recent and recent[0] < now - self.window:
+            recent.popleft()
+        if guild_id in self._pending:
+            self._pending[guild_id].append(member)
+            self.coalesced += 1
+            return True
+        if len(recent) < max(threshold, 1):
+            return False
+        self._pending[guild_id] = [member]
+        self.coalesced += 1
+        self._tasks[guild_id] = asyncio.create_task(self._flush_later(guild_id))
+        return True
+
+    def _prune(self, now: float) -> None:
+        # Guilds with no event inside the window have nothing left to count; drop them,
+        # at most once per window, so quiet guilds do not keep an entry forever.
+        self._pruned_at = now
+        for guild_id in [guild_id for guild_id, recent in self._recent.items() if recent[-1] < now - self.window]:
+            del self._recent[guild_id]
+
+    async def _flush_later(self, guild_id: int) -> None:
+        await asyncio.sleep(self.window)
+        self._tasks.pop(guild_id, None)
+        await self._flush(guild_id)
+
+    async def _flush(self, guild_id: int) -> None:
+        members = self._pending.pop(guild_id, [])
+        if not members:
+            return
+        self.batches += 1
+        try:
+            await self.flush(guild_id, members)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(members)} coalesced members for guild {guild_id}: {e}")
+
+    async def close(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        for guild_id in list(self._pending):
+            await self._flush(guild_id)
@@ -1,12 +1,51 @@
 import asyncio
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from pymongo import AsyncMongoClient, ASCENDING, UpdateOne
+from pymongo.errors import ConnectionFailure, DuplicateKeyError, OperationFailure, ServerSelectionTimeoutError
 import discord
 from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
 
+from utils.ban_cache import BanCache
+from utils.ban_filter import BanFilter
+from utils.embed_resolver import EmbedResolver, normalize_embed_name
+from utils.guild_config import GuildConfigCache
+from utils.send_queue import Priority, queue_send
+from utils.write_buffer import WriteBehindBuffer
+
 logger = logging.getLogger(__name__)
 
+db_retry = retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+
+INDEXES = {
+    "embed": [
+        ([("guild_id", ASCENDING), ("name_lower", ASCENDING)], {"name": "guild_name_lower", "unique": True}),
+        ([("guild_id", ASCENDING), ("name", ASCENDING)], {"name": "guild_name"}),
+    ],
+    "enoubot": [
+        ([("banned", ASCENDING)], {"name": "banned_true", "partialFilterExpression": {"banned": True}}),
+    ],
+}
+
+HOT_QUERIES = [
+    ("embed", {"guild_id": 0, "name": ""}),
+    ("embed", {"guild_id": 0, "name_lower": ""}),
+    ("embed", {"guild_id": 0}),
+    ("greeting", {"_id": 0}),
+    ("leave", {"_id": 0}),
+    ("enoubot", {"_id": ""}),
+    ("enoubot", {"banned": True}),
+]
+
+def _plan_stages(plan: dict):
+    if "queryPlan" in plan:
+        yield from _plan_stages(plan["queryPlan"])
+        return
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
 class MongoHandler:
     _instance = None
 
@@ -26,79 +65,273 @@ class MongoHandler:
         self.client = None
         self.db = None
         self.collection = None
+        self.ban_cache = BanCache()
+        self.ban_filter = BanFilter()
+        self._ban_changes = None
+        self.indexes_ready = False
+        self.write_buffer = WriteBehindBuffer(self._write_user_batch)
+        self._guild_configs = {}
+        self.embeds = EmbedResolver(self)
         self.connect()
 
+    def guild_config(self, collection: str) -> GuildConfigCache:
+        cache = self._guild_configs.get(collection)
+        if cache is None:
+            cache = self._guild_configs[collection] = GuildConfigCache(self, collection)
+        return cache
+
     async def log_to_channel(self, message: str):
         if self.bot.is_ready():
             log_channel = self.bot.get_channel(self.log_channel_id)
             if log_channel:
                 try:
-                    await log_channel.send(message)
+                    await queue_send(self.bot, log_channel, Priority.LOG, content=message)
                 except Exception as e:
                     logger.error(f"Failed to send log message: {e}")
 
     def connect(self):
+        # AsyncMongoClient does not touch the network until the first operation,
+        # so it is safe to build it before the event loop is running.
+        self.client = AsyncMongoClient(
+            self.uri,
+            tls=True,
+            tlsAllowInvalidCertificates=True,
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=100,
+            minPoolSize=10,
+            socketTimeoutMS=30000,
+            connectTimeoutMS=30000
+        )
+        self.db = self.client[self.db_name]
+        self.collection = self.db["enoubot"]
+
+    async def ping(self) -> bool:
+        if not self.client:
+            self.connect()
         try:
-            self.client = MongoClient(
-                self.uri,
-                tls=True,
-                tlsAllowInvalidCertificates=True,
-                serverSelectionTimeoutMS=5000,
-                maxPoolSize=100,
-                minPoolSize=10,
-                socketTimeoutMS=30000,
-                connectTimeoutMS=30000
-            )
-            self.db = self.client[self.db_name]
-            self.collection = self.db["enoubot"]
-            self.client.server_info()
-
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.create_task(self.log_to_channel(f"✅ Connected to MongoDB: {self.db_name}"))
-            else:
-                loop.run_until_complete(self.log_to_channel(f"✅ Connected to MongoDB: {self.db_name}"))
+            await self.client.server_info()
+            asyncio.create_task(self.log_to_channel(f"✅ Connected to MongoDB: {self.db_name}"))
+            return True
         except ServerSelectionTimeoutError:
             asyncio.create_task(self.log_to_channel("❌ MongoDB server is not available."))
         except ConnectionFailure:
             asyncio.create_task(self.log_to_channel("❌ Failed to connect to MongoDB server."))
+        return False
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def get_user_data(self, user_id: str) -> dict:
+    async def reconnect(self) -> bool:
+        await self.close_connection()
+        self.connect()
+        return await self.ping()
+
+    @db_retry
+    async def get_user_data(self, user_id: str) -> dict:
         if not self.client:
             self.connect()
         try:
-            user_data = self.collection.find_one({"_id": user_id})
+            # A batch may land while find_one runs; overlay what was buffered before and after it.
+            buffered = self.write_buffer.pending(user_id)
+            user_data = await self.collection.find_one({"_id": user_id})
+            pending = {**(buffered or {}), **(self.write_buffer.pending(user_id) or {})}
+            if pending:
+                user_data = {**(user_data or {}), **pending}
             if user_data:
                 user_data.pop("_id", None)
+                self.ban_cache.set(user_id, user_data.get("banned", False))
                 return user_data
+            self.ban_cache.set(user_id, False)
             return {}
         except ServerSelectionTimeoutError as e:
             logger.error("MongoDB server timeout. Retrying...", exc_info=e)
             raise
 
-    def update_user_data(self, user_id: str, update_fields: dict) -> None:
+    async def update_user_data(self, user_id: str, update_fields: dict) -> None:
         if not self.client:
             self.connect()
+        if "banned" not in update_fields:
+            if self.write_buffer.add(user_id, update_fields):
+                await self.write_buffer.flush()
+            return
+        # Ban changes bypass the buffer so every node sees them immediately;
+        # anything still pending for the user rides along in the same write.
+        update_fields = {**await self.write_buffer.pop(user_id), **update_fields}
+        if update_fields.get("banned"):
+            self._ban_filter_update(user_id, True)
         try:
-            self.collection.update_one(
+            await self.collection.update_one(
                 {"_id": user_id},
                 {"$set": update_fields},
                 upsert=True
             )
+            if "banned" in update_fields and not update_fields["banned"]:
+                self._ban_filter_update(user_id, False)
         except ServerSelectionTimeoutError:
             asyncio.create_task(self.log_to_channel("❌ Failed to update data, server is not available."))
+        finally:
+            if "banned" in update_fields:
+                self.ban_cache.invalidate(user_id)
 
-    def delete_user_data(self, user_id: str) -> None:
+    async def _write_user_batch(self, batch: dict) -> None:
         if not self.client:
             self.connect()
+        requests = [
+            UpdateOne({"_id": user_id}, {"$set": fields}, upsert=True)
+            for user_id, fields in batch.items()
+        ]
+        await self.collection.bulk_write(requests, ordered=False)
+
+    async def delete_user_data(self, user_id: str) -> None:
+        if not self.client:
+            self.connect()
+        await self.write_buffer.pop(user_id)
         try:
-            self.collection.delete_one({"_id": user_id})
+            await self.collection.delete_one({"_id": user_id})
+            self._ban_filter_update(user_id, False)
             asyncio.create_task(self.log_to_channel(f"🗑️ Deleted user data for {user_id}."))
         except ServerSelectionTimeoutError:
             asyncio.create_task(self.log_to_channel("❌ Failed to delete data, server is not available."))
+        finally:
+            self.ban_cache.invalidate(user_id)
+
+    async def ensure_indexes(self) -> bool:
+        """Backfills name_lower and creates INDEXES; returns False if Mongo could not be reached.
+
+        Until this succeeds once, keep_mongo_connection calls it again after every good ping.
+        """
+        try:
+            await self._backfill_embed_names()
+            for collection, indexes in INDEXES.items():
+                for keys, options in indexes:
+                    try:
+                        await self.db[collection].create_index(keys, **options)
+                    except (DuplicateKeyError, OperationFailure) as e:
+                        if not options.get("unique"):
+                            logger.error(f"Failed to create index {options['name']} on {collection}: {e}")
+                            continue
+                        logger.warning(f"Unique index {options['name']} on {collection} rejected ({e}), creating it non-unique")
+                        fallback = {k: v for k, v in options.items() if k != "unique"}
+                        try:
+                            await self.db[collection].create_index(keys, **fallback)
+                        except OperationFailure as e:
+                            logger.error(f"Failed to create index {options['name']} on {collection}: {e}")
+            await self.verify_query_plans()
+        except Exception as e:
+            logger.error(f"Failed to ensure indexes, will retry on the next connection check: {e}")
+            return False
+        self.indexes_ready = True
+        return True
+
+    async def _backfill_embed_names(self) -> None:
+        docs = await self.find("embed", {"name_lower": {"$exists": False}}, {"name": 1})
+        requests = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"name_lower": normalize_embed_name(doc["name"])}})
+            for doc in docs if isinstance(doc.get("name"), str)
+        ]
+        if requests:
+            await self.db["embed"].bulk_write(requests, ordered=False)
+            logger.info(f"Backfilled name_lower on {len(requests)} embed documents")
+
+    async def verify_query_plans(self) -> None:
+        for collection, query in HOT_QUERIES:
+            try:
+                explain = await self.db[collection].find(query).explain()
+            except OperationFailure as e:
+                logger.error(f"Failed to explain {collection} query {list(query)}: {e}")
+                continue
+            winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+            if "COLLSCAN" in _plan_stages(winning_plan):
+                logger.warning(f"Query on {collection} by {list(query)} falls back to a collection scan")
+
+    def _ban_filter_update(self, user_id: str, banned: bool) -> None:
+        if banned:
+            self.ban_filter.add(user_id)
+        else:
+            self.ban_filter.discard(user_id)
+        if self._ban_changes is not None:
+            self._ban_changes.append((user_id, banned))
+
+    async def load_ban_filter(self) -> bool:
+        # Changes made while the query runs may be missing from its result; replay them on top.
+        self._ban_changes = []
+        try:
+            docs = await self.find("enoubot", {"banned": True}, {"_id": 1})
+        except Exception as e:
+            logger.error(f"Failed to load ban filter: {e}")
+            return False
+        finally:
+            changes, self._ban_changes = self._ban_changes, None
+        self.ban_filter.load(doc["_id"] for doc in docs)
+        for user_id, banned in changes:
+            self._ban_filter_update(user_id, banned)
+        logger.info(f"Loaded {len(self.ban_filter)} banned user ids into the ban filter")
+        return True
+
+    async def refresh_ban_filter(self) -> None:
+        # Bans written by other nodes (or straight into Mongo) show up within one cache TTL,
+        # the same bound a cached ban status already has.
+        if self.ban_filter.age() >= self.ban_cache.ttl:
+            await self.load_ban_filter()
+
+    async def is_user_banned(self, user_id: str) -> bool:
+        # A filter that failed to load, or has not been refreshed for a while, could hide
+        # new bans; fall back to the per-user lookup until the next reload succeeds.
+        if self.ban_filter.age() < self.ban_cache.ttl * 2 and user_id not in self.ban_filter:
+            return False
+        banned = self.ban_cache.get(user_id)
+        if banned is not None:
+            return banned
+        user_data = await self.get_user_data(user_id)
+        return user_data.get("banned", False)
+
+    @db_retry
+    async def find_one(self, collection: str, query: dict, projection: dict = None):
+        if not self.client:
+            self.connect()
+        try:
+            return await self.db[collection].find_one(query, projection)
+        except ServerSelectionTimeoutError as e:
+            logger.error(f"MongoDB server timeout on {collection}.find_one. Retrying...", exc_info=e)
+            raise
+
+    @db_retry
+    async def find(self, collection: str, query: dict, projection: dict = None, limit: int = 0) -> list:
+        if not self.client:
+            self.connect()
+        try:
+            cursor = self.db[collection].find(query, projection, limit=limit)
+            return await cursor.to_list(None)
+        except ServerSelectionTimeoutError as e:
+            logger.error(f"MongoDB server timeout on {collection}.find. Retrying...", exc_info=e)
+            raise
+
+    async def update_one(self, collection: str, query: dict, update: dict, upsert: bool = False):
+        if not self.client:
+            self.connect()
+        try:
+            return await self.db[collection].update_one(query, update, upsert=upsert)
+        except ServerSelectionTimeoutError:
+            asyncio.create_task(self.log_to_channel(f"❌ Failed to update {collection}, server is not available."))
+            return None
+
+    async def insert_one(self, collection: str, document: dict):
+        if not self.client:
+            self.connect()
+        try:
+            return await self.db[collection].insert_one(document)
+        except ServerSelectionTimeoutError:
+            asyncio.create_task(self.log_to_channel(f"❌ Failed to insert into {collection}, server is not available."))
+            return None
+
+    async def delete_one(self, collection: str, query: dict):
+        if not self.client:
+            self.connect()
+        try:
+            return await self.db[collection].delete_one(query)
+        except ServerSelectionTimeoutError:
+            asyncio.create_task(self.log_to_channel(f"❌ Failed to delete from {collection}, server is not available."))
+            return None
 
-    def close_connection(self) -> None:
+    async def close_connection(self) -> None:
         if self.client:
-            self.client.close()
+            await self.client.close()
+            self.client = None
             asyncio.create_task(self.log_to_channel("🔌 MongoDB connection closed."))
@@ -0,0 +1,207 @@
+import asyncio
+import errno
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+META_FIELDS = ("id", "extractor_key", "title", "webpage_url", "upload_date", "release_date", "timestamp")
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+def cache_key(extractor: str, video_id: str) -> str:
+    return _UNSAFE.sub("_", f"{extractor}_{video_id}")
+
+class ReplayCache:
+    """Content-addressed cache of finished replay videos on disk.
+
+    Each entry is <key>.mp4 plus a <key>.json sidecar with the info fields the reply needs.
+    Writes go to a temp file in the same directory and are published with os.replace, so
+    readers never see a partial file. The index is rebuilt from disk on start and evicted
+    in LRU order once the total size goes over max_bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int, executor=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.executor = executor
+        self.tmp_dir = os.path.join(root, "tmp")
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._aliases: Dict[str, str] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._scan()
+
+    def _video_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.mp4")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def _scan(self) -> None:
+        for name in os.listdir(self.tmp_dir):
+            try:
+                os.remove(os.path.join(self.tmp_dir, name))
+            except OSError:
+                pass
+        found = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            try:
+                stat = os.stat(self._video_path(key))
+                with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                self._remove_files(key)
+                continue
+            found.append((stat.st_atime, key, stat.st_size, meta.get("aliases", [])))
+        for _, key, size, aliases in sorted(found):
+            self._entries[key] = size
+            self.size += size
+            for alias in aliases:
+                self._aliases[alias] = key
+        self._evict()
+
+    def resolve(self, key: str) -> str:
+        return self._aliases.get(key, key)
+
+    def get(self, key: str) -> Optional[Tuple[str, dict]]:
+        key = self.resolve(key)
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            os.utime(self._video_path(key))
+        except (OSError, ValueError):
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._video_path(key), meta
+
+    def temp_path(self, suffix: str = ".mp4") -> str:
+        return os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}{suffix}")
+
+    def _copy_in(self, src_path: str, dest_path: str) -> None:
+        # Scratch space may live on another filesystem (e.g. tmpfs): stage a copy here first.
+        staged = self.temp_path()
+        try:
+            shutil.copyfile(src_path, staged)
+            os.replace(staged, dest_path)
+        except BaseException:
+            try:
+                os.remove(staged)
+            except OSError:
+                pass
+            raise
+        os.remove(src_path)
+
+    async def put(self, key: str, src_path: str, info: dict, aliases: Iterable[str] = ()) -> str:
+        """Moves a finished file from temp_path() into the cache and returns its final path."""
+        aliases = sorted({alias for alias in aliases if alias and alias != key})
+        meta = {field: info.get(field) for field in META_FIELDS}
+        meta["aliases"] = aliases
+        meta_tmp = self.temp_path(".json")
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        try:
+            os.replace(src_path, self._video_path(key))
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # A cross-device copy can take a while for a large file; keep it off the event loop.
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._copy_in, src_path, self._video_path(key))
+        os.replace(meta_tmp, self._meta_path(key))
+        size = os.path.getsize(self._video_path(key))
+        if key in self._entries:
+            self.size -= self._entries.pop(key)
+        self._entries[key] = size
+        self.size += size
+        for alias in aliases:
+            self._aliases[alias] = key
+        self._evict(keep=key)
+        return self._video_path(key)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        while self.size > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            if key == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(key)
+                continue
+            self._drop(key)
+            self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        self.size -= self._entries.pop(key, 0)
+        for alias in [alias for alias, target in self._aliases.items() if target == key]:
+            del self._aliases[alias]
+        self._remove_files(key)
+
+    def _remove_files(self, key: str) -> None:
+        for path in (self._video_path(key), self._meta_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove cached replay file {path}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+class InfoCache:
+    """Short-lived TTL + LRU cache of pre-flight results per normalized URL, including rejections."""
+
+    def __init__(self, ttl: float = 300.0, error_ttl: float = 60.0, max_size: int = 1000):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] >= time.monotonic()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value) -> None:
+        ttl = self.error_ttl if isinstance(value, Exception) else self.ttl
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
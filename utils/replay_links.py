@@ -0,0 +1,49 @@
+import re
+from typing import Optional
+
+from utils.replay_cache import cache_key
+
+# One pass over the message finds the first supported link and its canonical id.
+# Group names double as yt-dlp extractor keys so the id maps straight onto the replay cache.
+LINK_PATTERN = re.compile(
+    r"(?:https?://)?(?:"
+    r"(?:www\.|m\.)?tiktok\.com/@[\w.-]+/video/(?P<TikTok>\d+)"
+    r"|(?:(?:vm|vt)\.tiktok\.com|(?:www\.)?tiktok\.com/t)/(?P<TikTokVM>[A-Za-z0-9]+)"
+    r"|(?:www\.|m\.)?youtube\.com/shorts/(?P<Youtube>[\w-]{11})"
+    r"|youtu\.be/(?P<YoutuBe>[\w-]{11})"
+    r")",
+    re.IGNORECASE
+)
+
+
+class VideoLink:
+    __slots__ = ("extractor", "video_id", "url")
+
+    def __init__(self, extractor: str, video_id: str, url: str):
+        self.extractor = extractor
+        self.video_id = video_id
+        self.url = url
+
+    @property
+    def cache_key(self) -> str:
+        return cache_key(self.extractor, self.video_id)
+
+def find_video_link(content: str) -> Optional[VideoLink]:
+    # Cheap substring gate: almost no chat message contains either, so the regex rarely runs.
+    lowered = content.lower()
+    if "tiktok.com" not in lowered and "youtu" not in lowered:
+        return None
+    match = LINK_PATTERN.search(content)
+    if match is None:
+        return None
+    platform = match.lastgroup
+    video_id = match.group(platform)
+    if platform == "YoutuBe":
+        platform = "Youtube"
+    if platform == "Youtube":
+        url = f"https://www.youtube.com/shorts/{video_id}"
+    else:
+        url = match.group(0)
+        if not url.lower().startswith("http"):
+            url = f"https://{url}"
+    return VideoLink(platform, video_id, url)
@@ -0,0 +1,77 @@
+import math
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Deque, Dict
+
+STAGES = ("extract", "download", "remux", "transcode", "upload", "suppress", "total")
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+class ReplayMetrics:
+    """Per-stage latency, byte counters and cache outcomes for the replay pipeline.
+
+    Each stage keeps its last `window` samples for percentiles plus lifetime count and max.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {stage: deque(maxlen=window) for stage in STAGES}
+        self._counts: Counter = Counter()
+        self._max: Dict[str, float] = {stage: 0.0 for stage in STAGES}
+        self.outcomes: Counter = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @contextmanager
+    def time(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def record(self, stage: str, seconds: float) -> None:
+        self._samples[stage].append(seconds)
+        self._counts[stage] += 1
+        self._max[stage] = max(self._max[stage], seconds)
+
+    def outcome(self, name: str) -> None:
+        self.outcomes[name] += 1
+
+    def snapshot(self) -> dict:
+        stages = {}
+        for stage in STAGES:
+            samples = self._samples[stage]
+            if not self._counts[stage]:
+                continue
+            stages[stage] = {
+                "count": self._counts[stage],
+                "avg_ms": sum(samples) / len(samples) * 1000,
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "max_ms": self._max[stage] * 1000,
+            }
+        return {
+            "stages": stages,
+            "outcomes": dict(self.outcomes),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+
+    def format(self) -> str:
+        snapshot = self.snapshot()
+        lines = [f"{'stage':<10}{'count':>7}{'avg':>9}{'p50':>9}{'p95':>9}{'max':>9}"]
+        for stage, stats in snapshot["stages"].items():
+            lines.append(
+                f"{stage:<10}{stats['count']:>7}{stats['avg_ms']:>7.0f}ms{stats['p50_ms']:>7.0f}ms"
+                f"{stats['p95_ms']:>7.0f}ms{stats['max_ms']:>7.0f}ms"
+            )
+        outcomes = ", ".join(f"{name}={count}" for name, count in sorted(snapshot["outcomes"].items())) or "none"
+        lines.append(f"outcomes: {outcomes}")
+        lines.append(f"bytes in: {self.bytes_in / 2**20:.1f} MB, bytes out: {self.bytes_out / 2**20:.1f} MB")
+        return "\n".join(lines)
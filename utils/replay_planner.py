@@ -0,0 +1,172 @@
+import os
+from typing import List, Optional, Tuple
+
+UPLOAD_LIMIT = 25 * 1024 * 1024
+# Share of the limit the encoder aims for; the rest absorbs container overhead and rate overshoot.
+TARGET_FILL = 0.92
+AUDIO_KBPS = 128
+LOW_AUDIO_KBPS = 64
+MIN_VIDEO_KBPS = 150
+MAX_DURATION = 600
+MAX_SOURCE_SIZE = 200 * 1024 * 1024
+PRIVATE_AVAILABILITY = ("private", "premium_only", "subscriber_only", "needs_auth")
+
+class PlanError(Exception):
+    pass
+
+def is_h264(vcodec: Optional[str]) -> bool:
+    vcodec = (vcodec or "").lower()
+    return vcodec.startswith("avc1") or vcodec.startswith("h264")
+
+def estimate_size(fmt: dict, duration: Optional[float]) -> Optional[float]:
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return float(size)
+    rate = fmt.get("tbr") or fmt.get("vbr") or fmt.get("abr")
+    if rate and duration:
+        return rate * 1000 / 8 * duration
+    return None
+
+def _has_video(fmt: dict) -> bool:
+    return fmt.get("vcodec") not in (None, "none")
+
+def _has_audio(fmt: dict) -> bool:
+    return fmt.get("acodec") not in (None, "none")
+
+def _candidates(info: dict) -> List[Tuple[str, List[dict]]]:
+    formats = info.get("formats") or []
+    candidates = [(fmt["format_id"], [fmt]) for fmt in formats if _has_video(fmt) and _has_audio(fmt)]
+    audio = [fmt for fmt in formats if _has_audio(fmt) and not _has_video(fmt) and fmt.get("ext") == "m4a"]
+    if audio:
+        best_audio = max(audio, key=lambda fmt: fmt.get("abr") or fmt.get("tbr") or 0)
+        candidates.extend(
+            (f"{fmt['format_id']}+{best_audio['format_id']}", [fmt, best_audio])
+            for fmt in formats if _has_video(fmt) and not _has_audio(fmt)
+        )
+    return candidates
+
+def _short_side(fmt: dict) -> int:
+    # "720p" means the short edge, so a vertical 720x1280 clip counts as 720p.
+    sides = [side for side in (fmt.get("width"), fmt.get("height")) if side]
+    return min(sides) if sides else 0
+
+def _quality(parts: List[dict]) -> tuple:
+    video = parts[0]
+    return (video.get("height") or 0, video.get("tbr") or 0)
+
+PASSTHROUGH = "passthrough"
+REMUX = "remux"
+TRANSCODE = "transcode"
+
+class DownloadPlan:
+    """Which format to fetch and what the file needs afterwards: nothing, a remux or an encode."""
+
+    __slots__ = ("format", "duration", "mode", "estimated_size")
+
+    def __init__(self, format: str, duration: Optional[float], mode: str, estimated_size: Optional[float]):
+        self.format = format
+        self.duration = duration
+        self.mode = mode
+        self.estimated_size = estimated_size
+
+def unwrap_info(info: dict) -> dict:
+    if info.get("_type") in ("playlist", "multi_video"):
+        entries = [entry for entry in info.get("entries") or [] if entry]
+        if len(entries) != 1:
+            raise PlanError("Playlists are not supported, please send a single video link")
+        return entries[0]
+    return info
+
+def check_info(info: dict, limit: int = UPLOAD_LIMIT, max_duration: float = MAX_DURATION) -> None:
+    if info.get("is_live") or info.get("live_status") in ("is_live", "is_upcoming", "post_live"):
+        raise PlanError("Live streams are not supported")
+    if info.get("availability") in PRIVATE_AVAILABILITY:
+        raise PlanError("This video is private or requires login")
+    duration = info.get("duration")
+    if duration and duration > max_duration:
+        raise PlanError(f"Video is too long ({int(duration)}s), the limit is {int(max_duration)}s")
+    if duration and video_kbps_for(duration, limit)[0] < MIN_VIDEO_KBPS:
+        raise PlanError(f"Video is too long ({int(duration)}s) to fit under {limit // (1024 * 1024)}MB")
+
+def plan_download(info: dict, limit: int = UPLOAD_LIMIT, max_duration: float = MAX_DURATION,
+                  max_source_size: int = MAX_SOURCE_SIZE) -> DownloadPlan:
+    """Rejects unusable videos and picks a format from metadata alone, before any download.
+
+    A passthrough candidate is H.264 in mp4 whose known or estimated size is under the limit;
+    H.264 in another container only needs a remux. Without either, the best source of at
+    most 720p is fetched for a size-targeted encode, unless it is known to be too large.
+    """
+    check_info(info, limit, max_duration)
+    duration = info.get("duration")
+
+    candidates = []
+    for format_id, parts in _candidates(info):
+        sizes = [estimate_size(fmt, duration) for fmt in parts]
+        size = sum(sizes) if all(size is not None for size in sizes) else None
+        candidates.append((format_id, parts, size))
+
+    fitting = [
+        candidate for candidate in candidates
+        if is_h264(candidate[1][0].get("vcodec")) and candidate[2] is not None and candidate[2] <= limit
+    ]
+    passthrough = [candidate for candidate in fitting if candidate[1][0].get("ext") == "mp4"]
+    for mode, group in ((PASSTHROUGH, passthrough), (REMUX, fitting)):
+        if group:
+            format_id, parts, size = max(group, key=lambda candidate: _quality(candidate[1]))
+            return DownloadPlan(format_id, duration, mode, size)
+
+    sources = [candidate for candidate in candidates if _short_side(candidate[1][0]) <= 720]
+    if not sources:
+        # A format filter can't take min(width, height); a 1280 long side is a 720 short side at 16:9.
+        return DownloadPlan(
+            "bestvideo[width<=1280][height<=1280]+bestaudio/best[width<=1280][height<=1280]/best",
+            duration, TRANSCODE, None
+        )
+    within = [candidate for candidate in sources if candidate[2] is None or candidate[2] <= max_source_size]
+    if not within:
+        smallest = min(candidate[2] for candidate in sources)
+        raise PlanError(f"Video is too large ({smallest / (1024 * 1024):.0f}MB) to process")
+    format_id, parts, size = max(within, key=lambda candidate: _quality(candidate[1]))
+    return DownloadPlan(format_id, duration, TRANSCODE, size)
+
+def route_file(path: str, vcodec: Optional[str], limit: int = UPLOAD_LIMIT) -> str:
+    """Decides from the downloaded file itself whether it can be sent as is."""
+    if not is_h264(vcodec) or os.stat(path).st_size > limit:
+        return TRANSCODE
+    return PASSTHROUGH if path.endswith(".mp4") else REMUX
+
+def remux_args(src: str, dst: str) -> List[str]:
+    return ["-i", src, "-c", "copy", "-movflags", "+faststart", dst]
+
+def video_kbps_for(duration: float, limit: int = UPLOAD_LIMIT) -> Tuple[int, int]:
+    total_kbps = limit * 8 * TARGET_FILL / 1000 / duration
+    audio_kbps = AUDIO_KBPS if total_kbps - AUDIO_KBPS >= 4 * AUDIO_KBPS else LOW_AUDIO_KBPS
+    return int(total_kbps - audio_kbps), audio_kbps
+
+def _scale_filter(video_kbps: int) -> List[str]:
+    # Caps the short edge, whichever way up the video is; -2 keeps the aspect ratio on the other.
+    short = 720 if video_kbps >= 1500 else 480
+    return ["-vf", f"scale='if(gt(iw,ih),-2,min({short},iw))':'if(gt(iw,ih),min({short},ih),-2)'"]
+
+def encode_passes(src: str, dst: str, duration: Optional[float], passlog: str,
+                  two_pass: bool = False, limit: int = UPLOAD_LIMIT) -> List[List[str]]:
+    """Builds the ffmpeg argument lists that re-encode src to an H.264 mp4 aimed at the limit.
+
+    Without a duration the bitrate cannot be targeted, so the old CRF 23 encode is kept
+    with a rate cap instead.
+    """
+    video = ["-c:v", "libx264", "-profile:v", "main", "-preset", "medium", "-pix_fmt", "yuv420p"]
+    output = ["-movflags", "+faststart", dst]
+    if not duration:
+        return [["-i", src, *video, "-crf", "23", "-maxrate", "2M", "-bufsize", "4M", "-c:a", "aac", "-b:a", f"{AUDIO_KBPS}k", *output]]
+    video_kbps, audio_kbps = video_kbps_for(duration, limit)
+    rate = ["-b:v", f"{video_kbps}k"]
+    scale = _scale_filter(video_kbps)
+    audio = ["-c:a", "aac", "-b:a", f"{audio_kbps}k"]
+    if two_pass:
+        return [
+            ["-i", src, *scale, *video, *rate, "-pass", "1", "-passlogfile", passlog, "-an", "-f", "null", os.devnull],
+            ["-i", src, *scale, *video, *rate, "-pass", "2", "-passlogfile", passlog, *audio, *output],
+        ]
+    cap = ["-maxrate", f"{video_kbps}k", "-bufsize", f"{video_kbps * 2}k"]
+    return [["-i", src, *scale, *video, *rate, *cap, *audio, *output]]
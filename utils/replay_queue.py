@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class ReplayQueueFull(Exception):
+    pass
+
+class _Job:
+    __slots__ = ("guild_id", "user_id", "func", "future")
+
+    def __init__(self, guild_id: int, user_id: int, func: Callable[[], Awaitable], future: asyncio.Future):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.func = func
+        self.future = future
+
+class ReplayQueue:
+    """Bounded job queue for replay downloads, drained by a fixed number of workers.
+
+    Jobs are FIFO within a guild and guilds are served round-robin, so one busy server
+    cannot starve the others. Limits apply to the whole queue and to the jobs one guild
+    or one user may have pending or running; submit() raises ReplayQueueFull past them.
+    """
+
+    def __init__(self, concurrency: int = 2, max_pending: int = 20, max_per_guild: int = 5, max_per_user: int = 2):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.max_per_guild = max_per_guild
+        self.max_per_user = max_per_user
+        self._guilds: "OrderedDict[int, Deque[_Job]]" = OrderedDict()
+        self._guild_jobs: Dict[int, int] = {}
+        self._user_jobs: Dict[int, int] = {}
+        self._ready = asyncio.Semaphore(0)
+        self._workers: List[asyncio.Task] = []
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _reject(self, reason: str) -> None:
+        self.rejected += 1
+        raise ReplayQueueFull(reason)
+
+    def submit(self, guild_id: int, user_id: int, func: Callable[[], Awaitable]) -> tuple:
+        """Queues func() and returns (future, position); position 0 means a worker is free."""
+        if self.pending >= self.max_pending:
+            self._reject("The replay queue is full, please try again later.")
+        if self._guild_jobs.get(guild_id, 0) >= self.max_per_guild:
+            self._reject("This server already has too many replays in progress.")
+        if self._user_jobs.get(user_id, 0) >= self.max_per_user:
+            self._reject("You already have too many replays in progress.")
+        self._start_workers()
+        job = _Job(guild_id, user_id, func, asyncio.get_running_loop().create_future())
+        self._guilds.setdefault(guild_id, deque()).append(job)
+        self._guild_jobs[guild_id] = self._guild_jobs.get(guild_id, 0) + 1
+        self._user_jobs[user_id] = self._user_jobs.get(user_id, 0) + 1
+        self.pending += 1
+        position = self._position(job)
+        self._ready.release()
+        return job.future, max(0, position - (self.concurrency - self.running))
+
+    async def run(self, guild_id: int, user_id: int, func: Callable[[], Awaitable],
+                  on_queued: Optional[Callable[[int], Awaitable]] = None):
+        future, position = self.submit(guild_id, user_id, func)
+        if position and on_queued is not None:
+            try:
+                await on_queued(position)
+            except Exception as e:
+                logger.warning(f"Failed to report replay queue position: {e}")
+        return await future
+
+    def _fair_order(self) -> List[_Job]:
+        queues = [list(jobs) for jobs in self._guilds.values()]
+        order = []
+        for idx in range(max(map(len, queues), default=0)):
+            order.extend(jobs[idx] for jobs in queues if idx < len(jobs))
+        return order
+
+    def _position(self, job: _Job) -> int:
+        return self._fair_order().index(job) + 1
+
+    def _next_job(self) -> _Job:
+        guild_id, jobs = next(iter(self._guilds.items()))
+        job = jobs.popleft()
+        del self._guilds[guild_id]
+        if jobs:
+            self._guilds[guild_id] = jobs
+        self.pending -= 1
+        return job
+
+    def _release(self, job: _Job) -> None:
+        for counts, key in ((self._guild_jobs, job.guild_id), (self._user_jobs, job.user_id)):
+            count = counts.get(key, 0) - 1
+            if count > 0:
+                counts[key] = count
+            else:
+                counts.pop(key, None)
+
+    def _start_workers(self) -> None:
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self.concurrency:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self) -> None:
+        while True:
+            await self._ready.acquire()
+            job = self._next_job()
+            if job.future.done():
+                self._release(job)
+                continue
+            self.running += 1
+            try:
+                result = await job.func()
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self.running -= 1
+                self.completed += 1
+                self._release(job)
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        self._workers.clear()
+        for jobs in self._guilds.values():
+            for job in jobs:
+                if not job.future.done():
+                    job.future.cancel()
+        self._guilds.clear()
+        self._guild_jobs.clear()
+        self._user_jobs.clear()
+        self._ready = asyncio.Semaphore(0)
+        self.pending = 0
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "guilds": len(self._guilds),
+        }
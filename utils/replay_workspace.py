@@ -0,0 +1,94 @@
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+JOB_PREFIX = "job-"
+
+class WorkspaceQuotaExceeded(Exception):
+    pass
+
+class Workspace:
+    __slots__ = ("root",)
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+class WorkspaceManager:
+    """Per-job scratch directories under one root, with a shared disk quota.
+
+    Every job gets its own directory that is removed when the job ends, whatever happens
+    inside it. A job reserves its expected size up front and is refused when the reservations
+    and the bytes already on disk would pass the quota. sweep() removes directories that no
+    live job owns, which after a crash is everything left under the root.
+    """
+
+    def __init__(self, root: str, quota_bytes: int):
+        # mkdtemp returns absolute paths on newer Pythons; keep every key absolute so
+        # sweep() always recognizes live job directories.
+        self.root = os.path.abspath(root)
+        self.quota_bytes = quota_bytes
+        self._active: Dict[str, int] = {}
+        self.swept = 0
+        self.refused = 0
+        os.makedirs(self.root, exist_ok=True)
+        self.sweep()
+
+    def usage(self) -> int:
+        return sum(max(_dir_size(path), reserved) for path, reserved in self._active.items())
+
+    @asynccontextmanager
+    async def job(self, reserve: int = 0):
+        if self.usage() + reserve > self.quota_bytes:
+            self.refused += 1
+            raise WorkspaceQuotaExceeded("Replay storage is busy, please try again in a moment.")
+        path = os.path.abspath(tempfile.mkdtemp(prefix=JOB_PREFIX, dir=self.root))
+        self._active[path] = reserve
+        try:
+            yield Workspace(path)
+        finally:
+            del self._active[path]
+            shutil.rmtree(path, ignore_errors=True)
+
+    def sweep(self) -> int:
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.abspath(os.path.join(self.root, name))
+            if path in self._active:
+                continue
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+                removed += 1
+            except OSError as e:
+                logger.warning(f"Failed to remove stale replay workspace {path}: {e}")
+        self.swept += removed
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._active),
+            "usage": self.usage(),
+            "quota": self.quota_bytes,
+            "swept": self.swept,
+            "refused": self.refused,
+        }
@@ -0,0 +1,181 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    # INTERACTION is for replies a user explicitly asked for; CHAT covers what the bot
+    # posts on its own in reaction to ordinary messages (AFK notices, automatic replays).
+    INTERACTION = 0
+    MODERATION = 1
+    CHAT = 2
+    GREETING = 3
+    LOG = 4
+
+class _Job:
+    __slots__ = ("priority", "seq", "target", "kwargs", "future", "enqueued_at")
+
+    def __init__(self, priority: Priority, seq: int, target, kwargs: dict, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.target = target
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class _RateGate:
+    """Global pacing shared by every bucket; waiters are released in priority order."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    async def acquire(self, priority: Priority) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        await future
+
+    async def _run(self) -> None:
+        while self._waiters:
+            delay = self._next - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._next = max(time.monotonic(), self._next) + self.interval
+            future.set_result(None)
+
+class SendQueue:
+    """Outbound message scheduler with one serial bucket per channel/DM.
+
+    Each bucket is a priority heap drained by its own worker, so a burst in one channel
+    never delays another. All buckets share a global rate gate. Buckets and the whole queue
+    are bounded; when full, the lowest-priority newest job is dropped, and send() resolves
+    to None for a dropped job.
+    """
+
+    def __init__(self, max_per_bucket: int = 50, max_total: int = 2000, rate: float = 40.0):
+        self.max_per_bucket = max_per_bucket
+        self.max_total = max_total
+        self._gate = _RateGate(rate)
+        self._buckets: Dict[tuple, List[_Job]] = {}
+        self._workers: Dict[tuple, asyncio.Task] = {}
+        self._seq = itertools.count()
+        self.depth = 0
+        self.max_depth = 0
+        self.sent = {priority: 0 for priority in Priority}
+        self.dropped = {priority: 0 for priority in Priority}
+        self.failed = 0
+        self._wait_total = {priority: 0.0 for priority in Priority}
+        self._wait_max = {priority: 0.0 for priority in Priority}
+
+    @staticmethod
+    def bucket_key(target) -> tuple:
+        if isinstance(target, (discord.User, discord.Member)):
+            return ("user", target.id)
+        return ("channel", getattr(target, "id", id(target)))
+
+    async def send(self, target, priority: Priority = Priority.LOG, **kwargs) -> Optional[discord.Message]:
+        key = self.bucket_key(target)
+        bucket = self._buckets.setdefault(key, [])
+        job = _Job(priority, next(self._seq), target, kwargs, asyncio.get_running_loop().create_future())
+        if len(bucket) >= self.max_per_bucket and not self._evict(bucket, job):
+            return self._drop(job)
+        if self.depth >= self.max_total and not self._evict_global(job):
+            return self._drop(job)
+        heapq.heappush(bucket, job)
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        worker = self._workers.get(key)
+        if worker is None or worker.done():
+            self._workers[key] = asyncio.create_task(self._drain(key))
+        return await job.future
+
+    def _drop(self, job: _Job) -> None:
+        self.dropped[job.priority] += 1
+        if not job.future.done():
+            job.future.set_result(None)
+        return None
+
+    def _evict(self, bucket: List[_Job], incoming: _Job) -> bool:
+        victim = max(bucket, key=lambda job: (job.priority, job.seq))
+        if victim.priority <= incoming.priority:
+            return False
+        bucket.remove(victim)
+        heapq.heapify(bucket)
+        self.depth -= 1
+        self._drop(victim)
+        return True
+
+    def _evict_global(self, incoming: _Job) -> bool:
+        candidates = [bucket for bucket in self._buckets.values() if bucket]
+        if not candidates:
+            return False
+        bucket = max(candidates, key=lambda b: max((job.priority, job.seq) for job in b))
+        return self._evict(bucket, incoming)
+
+    async def _drain(self, key: tuple) -> None:
+        bucket = self._buckets[key]
+        try:
+            while bucket:
+                job = heapq.heappop(bucket)
+                self.depth -= 1
+                if job.future.done():
+                    continue
+                await self._gate.acquire(job.priority)
+                waited = time.monotonic() - job.enqueued_at
+                self._wait_total[job.priority] += waited
+                self._wait_max[job.priority] = max(self._wait_max[job.priority], waited)
+                try:
+                    message = await job.target.send(**job.kwargs)
+                except Exception as e:
+                    self.failed += 1
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                else:
+                    self.sent[job.priority] += 1
+                    if not job.future.done():
+                        job.future.set_result(message)
+        finally:
+            if not bucket:
+                self._buckets.pop(key, None)
+            self._workers.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "buckets": len(self._buckets),
+            "failed": self.failed,
+            "priorities": {
+                priority.name.lower(): {
+                    "sent": self.sent[priority],
+                    "dropped": self.dropped[priority],
+                    "avg_wait_ms": self._wait_total[priority] / self.sent[priority] * 1000 if self.sent[priority] else 0.0,
+                    "max_wait_ms": self._wait_max[priority] * 1000,
+                }
+                for priority in Priority
+            },
+        }
+
+async def queue_send(bot, target, priority: Priority = Priority.LOG, **kwargs) -> Optional[discord.Message]:
+    send_queue = getattr(bot, "send_queue", None)
+    if send_queue is None:
+        return await target.send(**kwargs)
+    return await send_queue.send(target, priority, **kwargs)
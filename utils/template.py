@@ -0,0 +1,251 @@
+import datetime
+import re
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import discord
+
+
+TOKEN_PATTERN = re.compile(r"\{(user|user_tag|user_avatar|server_name|server_membercount|server_avatar)\}|\{embed:([^}]+)\}")
+
+PLACEHOLDERS: Dict[str, Callable[[discord.Member, discord.Guild], str]] = {
+    "user": lambda member, guild: member.mention,
+    "user_tag": lambda member, guild: member.display_name,
+    "user_avatar": lambda member, guild: member.display_avatar.url,
+    "server_name": lambda member, guild: guild.name,
+    "server_membercount": lambda member, guild: str(guild.member_count),
+    "server_avatar": lambda member, guild: guild.icon.url if guild.icon else "",
+}
+
+MESSAGE_LIMIT = 2000
+# Discord's per-field embed limits.
+TITLE_LIMIT = 256
+AUTHOR_LIMIT = 256
+DESCRIPTION_LIMIT = 4096
+FOOTER_LIMIT = 2048
+
+def placeholder_values(keys, member: discord.Member, guild: discord.Guild) -> Dict[str, str]:
+    return {key: PLACEHOLDERS[key](member, guild) for key in keys}
+
+def batch_placeholder_values(keys, members: List[discord.Member], guild: discord.Guild) -> Dict[str, str]:
+    values = {}
+    for key in keys:
+        if key == "user":
+            values[key] = ", ".join(member.mention for member in members)
+        elif key == "user_tag":
+            values[key] = ", ".join(member.display_name for member in members)
+        else:
+            values[key] = PLACEHOLDERS[key](members[0], guild)
+    return values
+
+def embed_batch_values(values: Dict[str, str], members: List[discord.Member]) -> Dict[str, str]:
+    # A joined member list only goes into embeds while it fits the smallest embed field;
+    # past that the first member stands in for the rest.
+    values = dict(values)
+    for key in ("user", "user_tag"):
+        if key in values and len(values[key]) > TITLE_LIMIT:
+            values[key] = f"{PLACEHOLDERS[key](members[0], None)} và {len(members) - 1} người khác"
+    return values
+
+def _clip(text: Optional[str], limit: int) -> Optional[str]:
+    if text is None or len(text) <= limit:
+        return text
+    return text[:limit - 1] + "…"
+
+class MessageTemplate:
+    """A message parsed once into literal segments, placeholder slots and embed slots."""
+
+    __slots__ = ("source", "parts", "slots", "keys", "embed_names")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.parts: List[str] = []
+        self.slots: List[Tuple[int, str]] = []
+        self.embed_names: List[str] = []
+        pos = 0
+        for match in TOKEN_PATTERN.finditer(source):
+            if match.start() > pos:
+                self.parts.append(source[pos:match.start()])
+            if match.group(1):
+                self.slots.append((len(self.parts), match.group(1)))
+                self.parts.append("")
+            else:
+                self.embed_names.append(match.group(2))
+            pos = match.end()
+        if pos < len(source):
+            self.parts.append(source[pos:])
+        self.keys = frozenset(key for _, key in self.slots)
+
+    def render(self, values: Dict[str, str]) -> str:
+        if not self.slots:
+            return "".join(self.parts)
+        parts = self.parts[:]
+        for idx, key in self.slots:
+            parts[idx] = values[key]
+        return "".join(parts)
+
+def _compile(text: Optional[str]) -> Optional[MessageTemplate]:
+    return MessageTemplate(text) if text else None
+
+def _render_url(template: Optional[MessageTemplate], values: Dict[str, str]) -> Optional[str]:
+    if template is None:
+        return None
+    url = template.render(values)
+    if url.startswith("http://") or url.startswith("https://"):
+        return url
+    return None
+
+class EmbedTemplate:
+    """An embed document compiled once; render() builds a fresh discord.Embed per member."""
+
+    def __init__(self, data: dict):
+        author = data.get("author")
+        footer = data.get("footer")
+        has_content = any(data.get(field) is not None for field in ("title", "description", "footer", "thumbnail", "image"))
+
+        if author is not None and author.get("name") is not None:
+            self.author_name = _compile(author["name"])
+            self.author_literal = author["name"]
+            self.author_icon = _compile(author.get("icon_url"))
+            self.author_icon_literal = author.get("icon_url")
+        else:
+            self.author_name = None
+            self.author_literal = "" if has_content else "Embed Trống"
+            self.author_icon = None
+            self.author_icon_literal = None
+
+        self.title = _compile(data.get("title"))
+
+        if data.get("description") is not None:
+            description = data["description"]
+        elif author is not None or has_content:
+            description = ""
+        else:
+            description = f"Embed `{data.get('name')}` hiện đang trống. Để chỉnh sửa hãy ấn vào các nút bên dưới!"
+        self.description = _compile(description)
+        self.description_literal = description
+
+        self.color = data.get("color") or None
+
+        if footer and footer.get("text"):
+            self.footer_text = _compile(footer["text"])
+            self.footer_icon = _compile(footer.get("icon_url"))
+            self.timestamp = bool(footer.get("timestamp"))
+        else:
+            self.footer_text = None
+            self.footer_icon = None
+            self.timestamp = False
+
+        self.thumbnail = data.get("thumbnail") or None
+        self.thumbnail_template = _compile(self.thumbnail)
+        self.image = data.get("image") or None
+        self.image_template = _compile(self.image)
+
+        self.keys = frozenset().union(*(
+            template.keys for template in (
+                self.author_name, self.author_icon, self.title, self.description,
+                self.footer_text, self.footer_icon, self.thumbnail_template, self.image_template
+            ) if template is not None
+        ))
+
+    def render(self, values: Dict[str, str]) -> discord.Embed:
+        embed = discord.Embed(
+            title=_clip(self.title.render(values), TITLE_LIMIT) if self.title else None,
+            description=_clip(
+                self.description.render(values) if self.description else self.description_literal, DESCRIPTION_LIMIT
+            ),
+            color=self.color
+        )
+        if self.author_name is not None:
+            embed.set_author(name=_clip(self.author_name.render(values), AUTHOR_LIMIT), icon_url=_render_url(self.author_icon, values))
+        else:
+            embed.set_author(name=self.author_literal, icon_url=self.author_icon_literal)
+        if self.footer_text is not None:
+            embed.set_footer(text=_clip(self.footer_text.render(values), FOOTER_LIMIT), icon_url=_render_url(self.footer_icon, values))
+            if self.timestamp:
+                embed.timestamp = datetime.datetime.utcnow() + datetime.timedelta(hours=7)
+        if self.thumbnail:
+            embed.set_thumbnail(url=_render_url(self.thumbnail_template, values) or self.thumbnail)
+        if self.image:
+            embed.set_image(url=_render_url(self.image_template, values) or self.image)
+        return embed
+
+class CompiledMessage:
+    """A greet/leave message plus the embeds it references, ready to render per member."""
+
+    def __init__(self, source: str, embed_docs: List[dict]):
+        self.message = MessageTemplate(source)
+        self.embeds = [EmbedTemplate(doc) for doc in embed_docs]
+        self.keys = self.message.keys.union(*(embed.keys for embed in self.embeds))
+
+    def values_for(self, member: discord.Member, guild: discord.Guild) -> Dict[str, str]:
+        return placeholder_values(self.keys, member, guild)
+
+    def render(self, member: discord.Member, guild: discord.Guild) -> Tuple[str, List[discord.Embed]]:
+        values = self.values_for(member, guild)
+        content = self.message.render(values).strip()
+        return content, [embed.render(values) for embed in self.embeds]
+
+    def render_batch(self, members: List[discord.Member], guild: discord.Guild,
+                     limit: int = MESSAGE_LIMIT) -> List[Tuple[str, List[discord.Embed]]]:
+        """Renders one message per chunk of members, with {user}/{user_tag} joined and
+        each chunk's content kept under the message limit. Embeds go on the first chunk only,
+        with long member lists shortened to fit Discord's embed limits."""
+        chunks, chunk = [], []
+        for member in members:
+            candidate = chunk + [member]
+            values = batch_placeholder_values(self.message.keys, candidate, guild)
+            if chunk and len(self.message.render(values).strip()) > limit:
+                chunks.append(chunk)
+                chunk = [member]
+            else:
+                chunk = candidate
+        if chunk:
+            chunks.append(chunk)
+        rendered = []
+        for idx, chunk in enumerate(chunks):
+            values = batch_placeholder_values(self.keys, chunk, guild)
+            content = self.message.render(values).strip()
+            embeds = []
+            if idx == 0:
+                embed_values = embed_batch_values(batch_placeholder_values(self.keys, members, guild), members)
+                embeds = [embed.render(embed_values) for embed in self.embeds]
+            rendered.append((content, embeds))
+        return rendered
+
+class TemplateCache:
+    """Compiled messages per (kind, guild), recompiled when the source text changes."""
+
+    def __init__(self, max_size: int = 5000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, int], CompiledMessage]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+
+    async def get(self, kind: str, guild_id: int, source: str, mongo_handler) -> CompiledMessage:
+        key = (kind, guild_id)
+        compiled = self._entries.get(key)
+        if compiled is not None and compiled.message.source == source:
+            self._entries.move_to_end(key)
+            return compiled
+        generation = self._generations.get(guild_id, 0)
+        embed_docs = await mongo_handler.embeds.resolve(guild_id, MessageTemplate(source).embed_names)
+        compiled = CompiledMessage(source, embed_docs)
+        # An embed edited while we were resolving makes this compile stale: use it once, don't keep it.
+        if self._generations.get(guild_id, 0) != generation:
+            return compiled
+        self._entries[key] = compiled
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return compiled
+
+    def invalidate_guild(self, guild_id: int) -> None:
+        self._generations[guild_id] = self._generations.get(guild_id, 0) + 1
+        for key in [key for key in self._entries if key[1] == guild_id]:
+            del self._entries[key]
+
+template_cache = TemplateCache()
+
+def invalidate_embeds(mongo_handler, guild_id: int) -> None:
+    mongo_handler.embeds.invalidate(guild_id)
+    template_cache.invalidate_guild(guild_id)
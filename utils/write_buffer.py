@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindBuffer:
+    """Coalesces $set updates per _id and writes them out in batches.
+
+    The batch being written stays visible through pending() until the write
+    completes, so readers never see an update vanish mid-flush.
+    """
+
+    def __init__(self, write_batch: Callable[[Dict[str, dict]], Awaitable[None]],
+                 max_pending: int = 500, flush_interval: float = 2.0):
+        self.write_batch = write_batch
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, dict] = {}
+        self._inflight: Dict[str, dict] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.updates = 0
+        self.batches = 0
+        self.documents_written = 0
+        self.failed_batches = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def add(self, _id: str, fields: dict) -> bool:
+        self.updates += 1
+        self._pending.setdefault(_id, {}).update(fields)
+        return len(self._pending) >= self.max_pending
+
+    def pending(self, _id: str) -> Optional[dict]:
+        fields = {**self._inflight.get(_id, {}), **self._pending.get(_id, {})}
+        return fields or None
+
+    async def pop(self, _id: str) -> dict:
+        """Removes and returns what is buffered for _id, after any in-flight write of it lands.
+
+        Callers that write or delete the document directly use this, so an older
+        batch can't overwrite their change (or resurrect a deleted document).
+        """
+        if _id in self._inflight:
+            async with self._lock:
+                pass
+        return self._pending.pop(_id, {})
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            batch = self._inflight = self._pending
+            self._pending = {}
+            started = time.perf_counter()
+            try:
+                await self.write_batch(batch)
+            except Exception as e:
+                self.failed_batches += 1
+                logger.error(f"Write-behind flush of {len(batch)} documents failed: {e}")
+                for _id, fields in batch.items():
+                    self._pending[_id] = {**fields, **self._pending.get(_id, {})}
+                return
+            finally:
+                self._inflight = {}
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.batches += 1
+            self.documents_written += len(batch)
+            self.last_batch_size = len(batch)
+            self.max_batch_size = max(self.max_batch_size, len(batch))
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "updates": self.updates,
+            "batches": self.batches,
+            "documents_written": self.documents_written,
+            "failed_batches": self.failed_batches,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "avg_batch_size": self.documents_written / self.batches if self.batches else 0.0,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+            "avg_flush_ms": self.total_flush_ms / self.batches if self.batches else 0.0,
+        }
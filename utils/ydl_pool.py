@@ -0,0 +1,141 @@
+import asyncio
+import itertools
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+import yt_dlp as youtube_dl
+
+logger = logging.getLogger(__name__)
+
+class PooledYoutubeDL(youtube_dl.YoutubeDL):
+    # Pooled instances live for the whole session and share one cookies.txt; letting each
+    # of them write its jar back on close corrupts the file when two close at once.
+    cookie_mtime: Optional[float] = None
+
+    def save_cookies(self):
+        pass
+
+class YDLPool:
+    """Reusable YoutubeDL instances, `size` per platform, checked out one job at a time.
+
+    Instances are built by `build_opts(platform, user_agent)`, rotating through the
+    user agents, with the platform's extractors instantiated up front. Each checkout
+    gets its own params (outtmpl, max_filesize, ...) which are restored on return,
+    and reloads the cookie jar if cookies.txt changed since the instance last saw it.
+    """
+
+    def __init__(
+        self,
+        build_opts: Callable[[str, str], dict],
+        user_agents: List[str],
+        size: int = 2,
+        cookiefile: str = "cookies.txt",
+        extractors: Optional[Dict[str, Iterable[str]]] = None,
+        executor=None
+    ):
+        self.build_opts = build_opts
+        self.size = size
+        self.cookiefile = cookiefile
+        self.extractors = extractors or {}
+        self.executor = executor
+        self._user_agents = itertools.cycle(user_agents)
+        self._idle: Dict[str, asyncio.Queue] = {}
+        self._created: Dict[str, int] = {}
+        self._all: List[PooledYoutubeDL] = []
+        self.checkouts = 0
+        self.waits = 0
+        self.cookie_reloads = 0
+
+    def _cookie_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.cookiefile).st_mtime
+        except OSError:
+            return None
+
+    def _build(self, platform: str, user_agent: str) -> PooledYoutubeDL:
+        opts = self.build_opts(platform, user_agent)
+        opts["cookiefile"] = self.cookiefile
+        ydl = PooledYoutubeDL(opts)
+        for key in self.extractors.get(platform, ()):
+            ydl.get_info_extractor(key)
+        ydl.cookie_mtime = self._cookie_mtime()
+        # Touch the jar so cookies.txt is parsed now, not inside the first job.
+        ydl.cookiejar
+        return ydl
+
+    def _refresh_cookies(self, ydl: PooledYoutubeDL) -> None:
+        mtime = self._cookie_mtime()
+        if mtime == ydl.cookie_mtime:
+            return
+        jar = ydl.cookiejar
+        jar.clear()
+        if mtime is not None:
+            try:
+                jar.load()
+            except Exception as e:
+                logger.warning(f"Failed to reload {self.cookiefile}: {e}")
+        ydl.cookie_mtime = mtime
+        self.cookie_reloads += 1
+
+    async def _new(self, platform: str) -> PooledYoutubeDL:
+        self._created[platform] = self._created.get(platform, 0) + 1
+        try:
+            loop = asyncio.get_running_loop()
+            ydl = await loop.run_in_executor(self.executor, self._build, platform, next(self._user_agents))
+        except BaseException:
+            self._created[platform] -= 1
+            raise
+        self._all.append(ydl)
+        return ydl
+
+    async def warm(self, platforms: Iterable[str]) -> None:
+        for platform in platforms:
+            if self._created.get(platform, 0) == 0:
+                try:
+                    ydl = await self._new(platform)
+                except Exception as e:
+                    logger.warning(f"Failed to warm yt-dlp for {platform or 'default'}: {e}")
+                    continue
+                self._idle.setdefault(platform, asyncio.Queue()).put_nowait(ydl)
+
+    @asynccontextmanager
+    async def acquire(self, platform: str, **params):
+        idle = self._idle.setdefault(platform, asyncio.Queue())
+        if idle.empty() and self._created.get(platform, 0) < self.size:
+            ydl = await self._new(platform)
+        else:
+            if idle.empty():
+                self.waits += 1
+            ydl = await idle.get()
+        self.checkouts += 1
+        saved = {name: ydl.params.get(name) for name in params}
+        format_selector = ydl.format_selector
+        try:
+            self._refresh_cookies(ydl)
+            for name, value in params.items():
+                ydl.params[name] = {"default": value} if name == "outtmpl" else value
+            yield ydl
+        finally:
+            ydl.params.update(saved)
+            ydl.format_selector = format_selector
+            idle.put_nowait(ydl)
+
+    def close(self) -> None:
+        for ydl in self._all:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+        self._all.clear()
+        self._idle.clear()
+        self._created.clear()
+
+    def stats(self) -> dict:
+        return {
+            "instances": dict(self._created),
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "cookie_reloads": self.cookie_reloads,
+        }